@@ -0,0 +1,266 @@
+import argparse  # used for reading the command line arguments
+import multiprocessing  # used for evaluating the placements in parallel
+import os  # used for selecting the drawing backend
+import time  # used for measuring the evaluation throughput
+
+# the autoplayer needs no display when it is run on its own
+if __name__ == '__main__':
+   os.environ.setdefault("STDDRAW_BACKEND", "null")
+
+from tetromino import Tetromino  # the class for modeling the tetrominoes
+from game_session import GameSession  # the class for modeling a game
+
+# the default weights of the heuristics used for scoring a placement, each
+# heuristic is computed on the game grid after the placement:
+#   height: the sum of the column heights
+#   holes: the number of empty cells below the highest tile of their column
+#   bumpiness: the sum of the height differences of the neighboring columns
+#   merge_potential: the number of columns topped with a 2 or a 4 tile (a new
+#      tile landing on them may merge with them)
+#   score_gain: the points gained by merging tiles and clearing full lines
+DEFAULT_WEIGHTS = {
+   "height": -0.51,
+   "holes": -0.36,
+   "bumpiness": -0.18,
+   "merge_potential": 0.05,
+   "score_gain": 0.002,
+}
+# the scores of the placements that win the game and that end it
+WIN_SCORE = float("inf")
+GAME_OVER_SCORE = float("-inf")
+
+# A function that returns the placements of the given tetromino as (rotation,
+# x) pairs, where x is the column of its bottom left cell, for all the rotation
+# states and all the columns where it is inside the game grid
+def get_placements(tetromino):
+   placements = []
+   for rotation, state in enumerate(tetromino.states):
+      for x in range(-state.min_dx, Tetromino.grid_width - state.max_dx):
+         placements.append((rotation, x))
+   return placements
+
+# A function that drops the given tetromino in the given rotation state and
+# column onto a copy of the given game grid from above it and locks it there
+# (merging the tiles and clearing the full lines), and returns the copy and
+# whether the game is over (the given grid and tetromino are not changed)
+def simulate_placement(grid, tetromino, rotation, x):
+   state = tetromino.states[rotation]
+   y = grid.get_landing_y(x, state.edges["down"])
+   cells = [(x + dx, y + dy, tile.number)
+            for (dx, dy), tile in zip(state.offsets, tetromino.tiles)]
+   result = grid.copy()
+   return result, result.lock_cells(cells)
+
+# A function that returns the values of the heuristics on the given game grid
+# after a placement, given the score before the placement
+def get_features(grid, score_before):
+   heights = grid.column_heights
+   total_height = sum(heights)
+   tiles = sum(mask.bit_count() for mask in grid.row_masks)
+   # (the top tile of each column is read from the cells of the grid, as the
+   # tile_matrix property copies the whole grid)
+   cells, row_order = grid.cells, grid.row_order
+   merge_potential = 0
+   for col, height in enumerate(heights):
+      if height and cells[row_order[height - 1], col] <= 2:
+         merge_potential += 1
+   return {
+      "height": total_height,
+      "holes": total_height - tiles,
+      "bumpiness": sum(abs(a - b) for a, b in zip(heights, heights[1:])),
+      "merge_potential": merge_potential,
+      "score_gain": grid.score - score_before,
+   }
+
+# A function that returns the score of the given game grid after a placement
+# (WIN_SCORE or GAME_OVER_SCORE when the placement ends the game) as the sum of
+# the heuristics multiplied by their weights
+def evaluate(grid, game_over, score_before, weights):
+   if grid.win:
+      return WIN_SCORE
+   if game_over:
+      return GAME_OVER_SCORE
+   features = get_features(grid, score_before)
+   return sum(weights[name] * value for name, value in features.items())
+
+# A function that returns the score of each of the given placements of the
+# current tetromino, and the number of the placements simulated for scoring
+# them; the score of a placement is the score of the best placement of the
+# next tetromino after it (when the next tetromino is given)
+def evaluate_placements(grid, current, next_tetromino, placements, weights):
+   scores, simulated = [], 0
+   for rotation, x in placements:
+      after, game_over = simulate_placement(grid, current, rotation, x)
+      simulated += 1
+      if next_tetromino is None or game_over:
+         scores.append(evaluate(after, game_over, grid.score, weights))
+         continue
+      best = GAME_OVER_SCORE
+      for next_rotation, next_x in get_placements(next_tetromino):
+         final, final_game_over = simulate_placement(after, next_tetromino,
+                                                     next_rotation, next_x)
+         simulated += 1
+         best = max(best, evaluate(final, final_game_over, grid.score, weights))
+      scores.append(best)
+   return scores, simulated
+
+# A function that prepares a process of the pool for evaluating placements on
+# a game grid of the given size
+def init_worker(grid_h, grid_w):
+   Tetromino.grid_height, Tetromino.grid_width = grid_h, grid_w
+
+# A function that evaluates placements in a process of the pool (the
+# arguments of evaluate_placements are given as a tuple)
+def evaluate_placements_task(args):
+   return evaluate_placements(*args)
+
+# A class for modeling a player that chooses the placement of each tetromino by
+# trying all of its placements (and the placements of the next tetromino after
+# each of them) and scoring the resulting game grids with weighted heuristics,
+# and that plays by issuing the keys of the game
+class Autoplayer:
+   # A constructor that creates an autoplayer with the given weights for the
+   # heuristics (DEFAULT_WEIGHTS for the ones not given), which evaluates the
+   # placements in a pool of the given number of processes (in this process
+   # when workers is 0), and looks ahead to the next tetromino when lookahead
+   # is True
+   def __init__(self, weights=None, workers=0, lookahead=True):
+      self.weights = dict(DEFAULT_WEIGHTS)
+      if weights:
+         self.weights.update(weights)
+      self.workers = workers
+      self.lookahead = lookahead
+      self.pool = None
+      self.pool_grid_size = None
+      # the tetromino that the planned placement is for, and the placement
+      self.planned_tetromino = None
+      self.target = None
+      # the number of placements simulated and the time spent evaluating them
+      self.placements = 0
+      self.evaluation_time = 0.0
+
+   # A method that returns the pool of processes for a game grid of the size
+   # of the Tetromino class (creating it when needed)
+   def get_pool(self):
+      grid_size = (Tetromino.grid_height, Tetromino.grid_width)
+      if self.pool is not None and self.pool_grid_size != grid_size:
+         self.close()
+      if self.pool is None:
+         self.pool = multiprocessing.Pool(self.workers, init_worker, grid_size)
+         self.pool_grid_size = grid_size
+      return self.pool
+
+   # A method for stopping the processes of the pool
+   def close(self):
+      if self.pool is not None:
+         self.pool.terminate()
+         self.pool.join()
+         self.pool = None
+
+   # A method that returns the best placement of the current tetromino on the
+   # given game grid as a (rotation, x) pair and its score, considering the
+   # placements of the next tetromino when looking ahead
+   def choose_placement(self, grid, current, next_tetromino=None):
+      if not self.lookahead:
+         next_tetromino = None
+      start_time = time.perf_counter()
+      placements = get_placements(current)
+      # the grid is copied without its display state (so it can be sent to
+      # the processes of the pool)
+      grid = grid.copy()
+      if self.workers:
+         # split the placements into chunks for the processes of the pool
+         n_chunks = min(len(placements), 2 * self.workers)
+         chunks = [placements[i::n_chunks] for i in range(n_chunks)]
+         results = self.get_pool().map(evaluate_placements_task, [
+            (grid, current, next_tetromino, chunk, self.weights) for chunk in chunks])
+         scores = {}
+         for chunk, (chunk_scores, simulated) in zip(chunks, results):
+            scores.update(zip(chunk, chunk_scores))
+            self.placements += simulated
+         scores = [scores[placement] for placement in placements]
+      else:
+         scores, simulated = evaluate_placements(grid, current, next_tetromino,
+                                                 placements, self.weights)
+         self.placements += simulated
+      self.evaluation_time += time.perf_counter() - start_time
+      # the first placement with the highest score is chosen
+      best = max(range(len(placements)), key=scores.__getitem__)
+      return placements[best], scores[best]
+
+   # A method that returns the number of placements simulated per second
+   def get_placements_per_sec(self):
+      if self.evaluation_time == 0:
+         return 0.0
+      return self.placements / self.evaluation_time
+
+   # A method that returns the keys to be typed now for moving the current
+   # tetromino of the given game towards its chosen placement: the rotations
+   # and moves that can be done now, and the hard drop once it is there
+   # (the placement is chosen when the current tetromino changes)
+   def get_keys(self, session):
+      grid, tetromino = session.grid, session.current_tetromino
+      if tetromino is not self.planned_tetromino:
+         self.target, _ = self.choose_placement(grid, tetromino, session.next_tetromino)
+         self.planned_tetromino = tetromino
+      target_rotation, target_x = self.target
+      # find the keys by trying them on the tetromino and restoring it after
+      position = tetromino.bottom_left_cell
+      saved = (tetromino.rotation, position.x, position.y)
+      keys = []
+      while True:
+         if tetromino.rotation != target_rotation and tetromino.rotate_clockwise(grid):
+            keys.append("space")
+         elif position.x != target_x:
+            direction = "left" if position.x > target_x else "right"
+            if not tetromino.move(direction, grid):
+               break
+            keys.append(direction)
+         else:
+            break
+      if tetromino.rotation == target_rotation and position.x == target_x:
+         keys.append("h")
+      tetromino.rotation, position.x, position.y = saved
+      return keys
+
+   # A method for playing the given game by typing the keys before each gravity
+   # step until the game is over or the given number of gravity steps is made
+   # (returns True when the game is over)
+   def play(self, session, max_ticks=None):
+      while max_ticks is None or session.tick < max_ticks:
+         for key in self.get_keys(session):
+            session.apply_key(key)
+         if session.gravity_step():
+            return True
+      return False
+
+# play games with the autoplayer without displaying them and report their
+# scores and the evaluation throughput in placements per second
+if __name__ == '__main__':
+   parser = argparse.ArgumentParser(description="Play Tetris 2048 with the autoplayer.")
+   parser.add_argument("--games", type=int, default=3, help="the number of games")
+   parser.add_argument("--seed", type=int, default=0, help="the seed of the first game")
+   parser.add_argument("--workers", type=int, default=0,
+                       help="the number of processes evaluating the placements "
+                            "(0 = evaluate in this process)")
+   parser.add_argument("--no-lookahead", action="store_true",
+                       help="do not consider the next tetromino")
+   parser.add_argument("--max-ticks", type=int, default=5000,
+                       help="the number of gravity steps after which a game is stopped")
+   parser.add_argument("--size", default="20x12", help="the grid size as HxW")
+   args = parser.parse_args()
+   grid_h, grid_w = (int(v) for v in args.size.lower().split("x"))
+   player = Autoplayer(workers=args.workers, lookahead=not args.no_lookahead)
+   try:
+      for seed in range(args.seed, args.seed + args.games):
+         session = GameSession(grid_h, grid_w, 5, 175, seed=seed)
+         player.play(session, args.max_ticks)
+         grid = session.grid
+         print("seed %d: %s, score %d, max tile %d, %d ticks" % (
+            seed, "won" if grid.win else "over" if session.game_over else "stopped",
+            grid.score, grid.max_tile, session.tick))
+   finally:
+      player.close()
+   print("%d placements in %.2f s: %.0f placements/s (%d workers)" % (
+      player.placements, player.evaluation_time, player.get_placements_per_sec(),
+      args.workers))
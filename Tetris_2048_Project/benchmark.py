@@ -0,0 +1,340 @@
+import argparse  # used for reading the command line arguments
+import copy  # used for copying the game grid fixtures
+import json  # used for saving and loading the results
+import math  # used for fitting the scaling curves
+import os  # used for selecting the drawing backend
+import platform  # used for describing the machine the results are from
+import random  # used for creating the tetrominoes of the fixtures
+import sys  # used for the exit status of the compare mode
+import time  # used for timing the operations
+
+# the benchmark needs no display, the game grid is never drawn
+os.environ.setdefault("STDDRAW_BACKEND", "null")
+
+import numpy as np  # used for creating the tiles of the fixtures
+from game_grid import GameGrid  # the class for modeling the game grid
+from tetromino import Tetromino  # the class for modeling the tetrominoes
+from game_session import GameSession  # the class for modeling a game
+
+# the format version of the saved results
+FORMAT_VERSION = 1
+# the game grid sizes (height x width) swept by default, from the default size
+# of the game up to 200 x 100
+DEFAULT_SIZES = ((20, 12), (50, 25), (100, 50), (200, 100))
+# the percentiles reported for the time of one operation
+PERCENTILES = (50, 90, 99)
+# the time in seconds of one batch of operations (the batch size is chosen so
+# that timing a batch takes about this long)
+BATCH_TIME = 0.001
+# the number of gravity steps after which a simulated game is stopped
+MAX_GAME_TICKS = 3000
+# the relative slowdown of an operation that is flagged as a regression
+DEFAULT_THRESHOLD = 0.10
+
+
+# A function that returns the fixture of a game grid with the given size: the
+# bottom half of the grid is filled with random tiles (exponents 1 to max_exponent)
+# leaving one random empty cell in each row, so no row is full (the fixture is
+# the same for the same size and seed)
+def make_grid(grid_h, grid_w, max_exponent=10, seed=0):
+   rng = np.random.default_rng([seed, grid_h, grid_w])
+   matrix = np.zeros((grid_h, grid_w), dtype=np.uint8)
+   stack_h = grid_h // 2
+   matrix[:stack_h] = rng.integers(1, max_exponent + 1, size=(stack_h, grid_w))
+   matrix[np.arange(stack_h), rng.integers(0, grid_w, size=stack_h)] = 0
+   grid = GameGrid(grid_h, grid_w, 5)
+   grid.load_tile_matrix(matrix)
+   # the tiles of the fixture are not merged before the benchmarks
+   grid.dirty_columns.clear()
+   return grid
+
+# A function that returns the fixture of a tetromino of the given shape with its
+# bottom left cell at the given position on a game grid of the given size
+def make_tetromino(shape, grid_h, grid_w, x, y, seed=0):
+   Tetromino.grid_height, Tetromino.grid_width = grid_h, grid_w
+   tetromino = Tetromino(shape, random.Random(seed))
+   tetromino.bottom_left_cell.x, tetromino.bottom_left_cell.y = x, y
+   return tetromino
+
+
+# A function that times an operation and returns the times in seconds of one
+# operation in each sample, the operation is called in batches (the time of a
+# batch divided by its size is one sample) unless a setup function is given,
+# then the setup function is called before each operation (without timing it)
+# and its result is passed to the operation
+def time_operation(operation, samples, setup=None):
+   times = []
+   if setup is not None:
+      for _ in range(samples):
+         state = setup()
+         start = time.perf_counter()
+         operation(state)
+         times.append(time.perf_counter() - start)
+      return times
+   # choose the batch size that takes about BATCH_TIME (also warms up)
+   batch = 1
+   while True:
+      start = time.perf_counter()
+      for _ in range(batch):
+         operation()
+      if time.perf_counter() - start >= BATCH_TIME or batch >= 1 << 20:
+         break
+      batch *= 2
+   for _ in range(samples):
+      start = time.perf_counter()
+      for _ in range(batch):
+         operation()
+      times.append((time.perf_counter() - start) / batch)
+   return times
+
+# A function that returns the given percentile of the given sorted values
+def percentile(sorted_values, p):
+   index = (len(sorted_values) - 1) * p / 100
+   low = int(index)
+   high = min(low + 1, len(sorted_values) - 1)
+   return sorted_values[low] + (sorted_values[high] - sorted_values[low]) * (index - low)
+
+# A function that returns the summary of the given times in seconds of an
+# operation: the operations per second and the time of one operation in
+# microseconds (the mean and the percentiles)
+def summarize(times, ops=None):
+   if ops is None:
+      ops = [1] * len(times)
+   per_op = sorted(t / n for t, n in zip(times, ops))
+   result = {"ops_per_sec": sum(ops) / sum(times),
+             "mean_us": sum(times) / sum(ops) * 1e6,
+             "samples": len(times)}
+   for p in PERCENTILES:
+      result["p%d_us" % p] = percentile(per_op, p) * 1e6
+   return result
+
+
+# The benchmarks of the operations on a game grid of a given size, each
+# function returns the times of the operation and the number of operations
+# timed in each sample (None when each sample is one operation)
+
+# A function that times locking an O tetromino on top of the tiles of the
+# fixture (merging its tiles and clearing full lines)
+def bench_update_grid(grid_h, grid_w, samples):
+   grid = make_grid(grid_h, grid_w)
+   x = grid_w // 2 - 1
+   tetromino = make_tetromino("O", grid_h, grid_w, x, 0)
+   tetromino.bottom_left_cell.y = tetromino.get_landing_y(grid)
+   tiles, position = tetromino.get_min_bounded_tile_matrix(True)
+   return time_operation(lambda g: g.update_grid(tiles, position), samples,
+                         setup=lambda: copy.deepcopy(grid)), None
+
+# A function that times merging the tiles in all the columns of a fixture with
+# small tile numbers (so most columns have tiles to be merged)
+def bench_merge_tiles(grid_h, grid_w, samples):
+   grid = make_grid(grid_h, grid_w, max_exponent=3)
+   def setup():
+      g = copy.deepcopy(grid)
+      g.dirty_columns = dict.fromkeys(range(grid_w), 0)
+      return g
+   return time_operation(lambda g: g.merge_tiles(), samples, setup=setup), None
+
+# A function that times clearing four full rows at the bottom of the fixture
+def bench_clear_full_lines(grid_h, grid_w, samples):
+   grid = make_grid(grid_h, grid_w)
+   matrix = grid.tile_matrix
+   matrix[:4][matrix[:4] == 0] = 1
+   grid.load_tile_matrix(matrix)
+   grid.dirty_columns.clear()
+   return time_operation(lambda g: g.clear_full_lines(), samples,
+                         setup=lambda: copy.deepcopy(grid)), None
+
+# A function that returns the fixture grid and a T tetromino right above the
+# tiles of the fixture in the middle of the grid
+def tetromino_on_stack(grid_h, grid_w):
+   grid = make_grid(grid_h, grid_w)
+   x = grid_w // 2 - 1
+   tetromino = make_tetromino("T", grid_h, grid_w, x, 0)
+   tetromino.bottom_left_cell.y = tetromino.get_landing_y(grid) + 1
+   return grid, tetromino
+
+# A function that times checking if a tetromino right above the tiles can be
+# moved down
+def bench_can_be_moved_down(grid_h, grid_w, samples):
+   grid, tetromino = tetromino_on_stack(grid_h, grid_w)
+   return time_operation(lambda: tetromino.can_be_moved("down", grid), samples), None
+
+# A function that times checking if a tetromino right above the tiles can be
+# moved left
+def bench_can_be_moved_left(grid_h, grid_w, samples):
+   grid, tetromino = tetromino_on_stack(grid_h, grid_w)
+   return time_operation(lambda: tetromino.can_be_moved("left", grid), samples), None
+
+# A function that times checking if a tetromino right above the tiles fits in
+# its next rotation state
+def bench_can_fit(grid_h, grid_w, samples):
+   grid, tetromino = tetromino_on_stack(grid_h, grid_w)
+   return time_operation(lambda: tetromino.can_fit(1, grid), samples), None
+
+# A function that times rotating a tetromino right above the tiles
+def bench_rotate_clockwise(grid_h, grid_w, samples):
+   grid, tetromino = tetromino_on_stack(grid_h, grid_w)
+   return time_operation(lambda: tetromino.rotate_clockwise(grid), samples), None
+
+# A function that times hard dropping a tetromino from the top of the grid
+def bench_hard_drop(grid_h, grid_w, samples):
+   grid, tetromino = tetromino_on_stack(grid_h, grid_w)
+   position = tetromino.bottom_left_cell
+   def hard_drop():
+      position.y = grid_h - 1
+      tetromino.move("h", grid, hard_drop=True)
+   return time_operation(hard_drop, samples), None
+
+# A function that times simulated games with random keys (each sample is one
+# game, stopped after MAX_GAME_TICKS gravity steps), and one operation is one
+# gravity step with the key applied before it
+def bench_game(grid_h, grid_w, samples):
+   times, ticks = [], []
+   keys = GameSession.keys + (None, None)
+   for seed in range(samples):
+      session = GameSession(grid_h, grid_w, 5, 175, seed=seed)
+      rng = random.Random(seed)
+      start = time.perf_counter()
+      while session.tick < MAX_GAME_TICKS:
+         key = rng.choice(keys)
+         if key is not None:
+            session.apply_key(key)
+         if session.gravity_step():
+            break
+      times.append(time.perf_counter() - start)
+      ticks.append(session.tick)
+   return times, ticks
+
+# the benchmarks with their names and the number of samples taken for each
+BENCHMARKS = {
+   "game_grid.update_grid": (bench_update_grid, 200),
+   "game_grid.merge_tiles": (bench_merge_tiles, 200),
+   "game_grid.clear_full_lines": (bench_clear_full_lines, 200),
+   "tetromino.can_be_moved_down": (bench_can_be_moved_down, 50),
+   "tetromino.can_be_moved_left": (bench_can_be_moved_left, 50),
+   "tetromino.can_fit": (bench_can_fit, 50),
+   "tetromino.rotate_clockwise": (bench_rotate_clockwise, 50),
+   "tetromino.hard_drop": (bench_hard_drop, 50),
+   "game": (bench_game, 5),
+}
+
+
+# A function that runs the given benchmarks on the given grid sizes and returns
+# the results (the number of samples is scaled by the given factor)
+def run(names, sizes, sample_scale=1.0):
+   results = []
+   for name in names:
+      function, samples = BENCHMARKS[name]
+      for grid_h, grid_w in sizes:
+         times, ops = function(grid_h, grid_w, max(2, int(samples * sample_scale)))
+         result = {"name": name, "size": "%dx%d" % (grid_h, grid_w),
+                   "grid_h": grid_h, "grid_w": grid_w}
+         result.update(summarize(times, ops))
+         results.append(result)
+         print("%-28s %9s %14.0f ops/s %10.2f us p50 %10.2f us p99" % (
+            name, result["size"], result["ops_per_sec"], result["p50_us"],
+            result["p99_us"]), flush=True)
+   return {"version": FORMAT_VERSION,
+           "machine": {"python": platform.python_version(),
+                       "implementation": platform.python_implementation(),
+                       "platform": platform.platform(),
+                       "processor": platform.machine(),
+                       "numpy": np.__version__},
+           "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+           "results": results}
+
+# A function that returns the scaling curve of each benchmark: how the time of
+# an operation grows with the number of grid cells, as the exponent k of the
+# fit time ~ cells^k (0 = constant, 1 = linear in the number of cells)
+def scaling(report):
+   points = {}
+   for result in report["results"]:
+      cells = result["grid_h"] * result["grid_w"]
+      points.setdefault(result["name"], []).append(
+         (math.log(cells), math.log(result["mean_us"])))
+   curves = {}
+   for name, xy in points.items():
+      if len(xy) < 2:
+         continue
+      mean_x = sum(x for x, _ in xy) / len(xy)
+      mean_y = sum(y for _, y in xy) / len(xy)
+      curves[name] = sum((x - mean_x) * (y - mean_y) for x, y in xy) / \
+                     sum((x - mean_x) ** 2 for x, _ in xy)
+   return curves
+
+# A function that compares the given results with the given baseline results
+# and prints them, returns the number of regressions (the operations that are
+# slower than in the baseline by more than the given threshold)
+def compare(baseline, current, threshold=DEFAULT_THRESHOLD):
+   baseline_results = {(r["name"], r["size"]): r for r in baseline["results"]}
+   regressions = 0
+   print("%-28s %9s %14s %14s %8s" % ("benchmark", "size", "baseline ops/s",
+                                      "current ops/s", "change"))
+   for result in current["results"]:
+      key = (result["name"], result["size"])
+      if key not in baseline_results:
+         continue
+      ratio = result["ops_per_sec"] / baseline_results[key]["ops_per_sec"]
+      flag = ""
+      if ratio < 1 - threshold:
+         flag = "REGRESSION"
+         regressions += 1
+      elif ratio > 1 + threshold:
+         flag = "faster"
+      print("%-28s %9s %14.0f %14.0f %+7.1f%% %s" % (
+         result["name"], result["size"], baseline_results[key]["ops_per_sec"],
+         result["ops_per_sec"], (ratio - 1) * 100, flag))
+   return regressions
+
+# A function that returns the grid sizes given as "HxW,HxW,..."
+def parse_sizes(text):
+   return [tuple(int(v) for v in size.lower().split("x")) for size in text.split(",")]
+
+# The main function that runs the benchmarks (and saves their results) or
+# compares saved results, returns the exit status (1 when there are regressions)
+def main(argv=None):
+   parser = argparse.ArgumentParser(
+      description="Benchmark the game engine on grid sizes up to 200x100.")
+   parser.add_argument("--sizes", type=parse_sizes, default=list(DEFAULT_SIZES),
+                       help="grid sizes as HxW,HxW,... (default: %s)" %
+                       ",".join("%dx%d" % size for size in DEFAULT_SIZES))
+   parser.add_argument("--bench", action="append", choices=sorted(BENCHMARKS),
+                       help="run only the given benchmark (can be repeated)")
+   parser.add_argument("--quick", action="store_true",
+                       help="take a tenth of the samples")
+   parser.add_argument("-o", "--output", help="save the results as JSON to this file")
+   parser.add_argument("--baseline", help="compare the results with these saved results")
+   parser.add_argument("--compare", nargs=2, metavar=("BASELINE", "CURRENT"),
+                       help="only compare two saved results")
+   parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                       help="the slowdown flagged as a regression (default: %.2f)" %
+                       DEFAULT_THRESHOLD)
+   args = parser.parse_args(argv)
+   if args.compare:
+      with open(args.compare[0]) as f:
+         baseline = json.load(f)
+      with open(args.compare[1]) as f:
+         current = json.load(f)
+   else:
+      current = run(args.bench or list(BENCHMARKS), args.sizes,
+                    0.1 if args.quick else 1.0)
+      current["scaling"] = scaling(current)
+      if current["scaling"]:
+         print("\nscaling exponent k of time ~ cells^k:")
+      for name, k in current["scaling"].items():
+         print("%-28s %6.2f" % (name, k))
+      if args.output:
+         with open(args.output, "w") as f:
+            json.dump(current, f, indent=1)
+      if not args.baseline:
+         return 0
+      with open(args.baseline) as f:
+         baseline = json.load(f)
+      print()
+   regressions = compare(baseline, current, args.threshold)
+   print("%d regression(s) over %.0f%%" % (regressions, args.threshold * 100))
+   return 1 if regressions else 0
+
+# run the benchmarks when this module is run
+if __name__ == '__main__':
+   sys.exit(main())
@@ -0,0 +1,58 @@
+import time  # used for measuring the time elapsed in the game loop
+
+# A class for scheduling the steps of the game loop with fixed timesteps, the
+# gravity (automatic moves down), the rendering and the input polling steps
+# have their own intervals so that each of them can be configured separately
+class GameClock:
+   # the maximum number of gravity steps done at once to catch up after a stall
+   max_catch_up_steps = 5
+
+   # A constructor for creating a game clock with the given intervals (in ms),
+   # a clock that is not realtime (e.g., for a headless game) does not wait
+   # and makes one gravity step and renders in each iteration of the loop
+   def __init__(self, gravity_interval, render_interval, input_interval,
+                realtime=True):
+      self.gravity_interval = gravity_interval / 1000
+      self.render_interval = render_interval / 1000
+      self.input_interval = input_interval / 1000
+      self.realtime = realtime
+      self.reset()
+
+   # A method for restarting the schedule from the current time (e.g., after
+   # the game is paused, so that the paused time does not cause gravity steps)
+   def reset(self):
+      now = time.perf_counter()
+      self.next_gravity = now + self.gravity_interval
+      self.next_render = now
+
+   # A method that returns the number of gravity steps that are due
+   def gravity_steps(self):
+      if not self.realtime:
+         return 1
+      now = time.perf_counter()
+      if now < self.next_gravity:
+         return 0
+      steps = int((now - self.next_gravity) / self.gravity_interval) + 1
+      self.next_gravity += steps * self.gravity_interval
+      return min(steps, GameClock.max_catch_up_steps)
+
+   # A method that returns whether a frame is due to be rendered
+   def render_due(self):
+      if not self.realtime:
+         return True
+      now = time.perf_counter()
+      if now < self.next_render:
+         return False
+      # skip the frames that are missed instead of rendering them in a burst
+      self.next_render = max(self.next_render + self.render_interval, now)
+      return True
+
+   # A method for sleeping until the next step of the game loop is due, the
+   # input is polled at least once every input_interval
+   def wait(self):
+      if not self.realtime:
+         return
+      now = time.perf_counter()
+      next_step = min(self.next_gravity, self.next_render, now + self.input_interval)
+      if next_step > now:
+         time.sleep(next_step - now)
@@ -1,10 +1,14 @@
 import lib.stddraw as stddraw  # used for displaying the game grid
-from lib.color import Color  # used for coloring the game grid
-from point import Point  # used for tile positions
+from lib.color import getColor  # used for coloring the game grid (shared colors)
+from tile import Tile  # used for drawing the tiles locked on the game grid
 import numpy as np  # fundamental Python module for scientific computing
+import bisect  # used for counting the cleared rows below the top of a column
 
 # A class for modeling the game grid
 class GameGrid:
+   # the exponent of the tile number that wins the game (2^11 = 2048)
+   win_exponent = 11
+
    # A constructor for creating the game grid based on the given arguments
    def __init__(self, grid_h, grid_w, right_panel_w):
       # set the dimensions of the game grid as the given arguments
@@ -13,17 +17,40 @@ class GameGrid:
 
       self.right_panel_width = right_panel_w
 
-      # create a tile matrix to store the tiles locked on the game grid
-      self.tile_matrix = np.full((grid_h, grid_w), None)
+      # create a buffer of rows to store the tiles locked on the game grid,
+      # each cell keeps the exponent of its tile number (0 = empty, k = 2^k)
+      self.cells = np.zeros((grid_h, grid_w), dtype=np.uint8)
+      # the rows of the buffer are not kept in order, row_order stores the
+      # buffer row of each grid row (from the bottom row to the top row) so
+      # that clearing a row only reorders these indexes and copies no rows
+      self.row_order = np.arange(grid_h)
+      # the occupancy of each grid row (from the bottom row to the top row) as
+      # an integer bitmask where bit k is set when the cell in column k is
+      # occupied, used for fast collision checks and for finding full rows
+      self.row_masks = [0] * grid_h
+      self.full_row_mask = (1 << grid_w) - 1
+      # the height of each column (the row above its highest tile)
+      self.column_heights = [0] * grid_w
+      # the sum of the tile numbers in each row, the number of tiles with each
+      # exponent and the largest exponent on the grid (all kept up to date as
+      # the tiles are locked, merged and cleared instead of scanning the grid)
+      self.row_sums = [0] * grid_h
+      self.exponent_counts = [0] * 256
+      self.max_exponent = 0
+      # the columns that may contain vertically adjacent tiles with the same
+      # number (only these columns are processed by the merge_tiles method),
+      # each with its lowest changed row (the rows below it are not changed,
+      # so they are not processed)
+      self.dirty_columns = {}
       # create the tetromino that is currently being moved on the game grid
       self.current_tetromino = None
       # the game_over flag shows whether the game is over or not
       self.game_over = False
       # set the color used for the empty grid cells
-      self.empty_cell_color = Color(206, 195, 181)
+      self.empty_cell_color = getColor(206, 195, 181)
       # set the colors used for the grid lines and the grid boundaries
-      self.line_color = Color(185,171,158)
-      self.boundary_color = Color(132, 122, 113)
+      self.line_color = getColor(185,171,158)
+      self.boundary_color = getColor(132, 122, 113)
       # thickness values used for the grid lines and the grid boundaries
       self.line_thickness = 0.002
       self.box_thickness = 10 * self.line_thickness
@@ -33,67 +60,195 @@ class GameGrid:
       self.score = 0
       # initialize the game as not won
       self.win = False
-      # initialize speed
+      # the points gained by merging tiles and by clearing full lines when the
+      # last tetromino was locked
+      self.score_deltas = {"merge": 0, "line_clear": 0}
+      # initialize speed (the time between two automatic moves down in ms)
       self.speed = 250 # default
 
-   # A method for displaying the game grid
+      # attributes that the display method uses for redrawing only the parts
+      # of the display that changed: the picture of the static background,
+      # the locked tiles, the active tetromino's cells, the score and the next
+      # tetromino that were drawn last, and whether all must be redrawn
+      self.background = None
+      self.drawn_matrix = None
+      self.drawn_piece_cells = {}
+      self.drawn_score = None
+      self.drawn_next = None
+      self.full_redraw = True
+
+   # A property that returns a copy of the locked tile exponents with the
+   # rows in order (row 0 is the bottom row of the game grid)
+   @property
+   def tile_matrix(self):
+      return self.cells[self.row_order]
+
+   # A method for replacing the locked tiles with the given tile exponents
+   # (rows in the same order as the tile_matrix property, 0 = empty) and
+   # updating the row bitmasks, column heights, row sums and exponent counts,
+   # e.g. for setting up a game grid with given tiles
+   def load_tile_matrix(self, matrix):
+      self.cells = np.array(matrix, dtype=np.uint8).reshape(self.grid_height, self.grid_width)
+      self.row_order = np.arange(self.grid_height)
+      occupied = self.cells != 0
+      self.row_masks = [sum(1 << col for col in np.flatnonzero(row).tolist())
+                        for row in occupied]
+      top_rows = self.grid_height - np.argmax(occupied[::-1], axis=0)
+      self.column_heights = np.where(occupied.any(axis=0), top_rows, 0).tolist()
+      numbers = np.where(occupied, np.left_shift(1, self.cells.astype(np.int64)), 0)
+      self.row_sums = numbers.sum(axis=1).tolist()
+      self.exponent_counts = np.bincount(self.cells.ravel(), minlength=256).tolist()
+      self.exponent_counts[0] = 0  # the empty cells are not counted
+      self.max_exponent = int(self.cells.max())
+      # all the columns with tiles may contain tiles to be merged
+      self.dirty_columns = dict.fromkeys(np.flatnonzero(occupied.any(axis=0)).tolist(), 0)
+
+   # A method that returns a copy of this game grid with its own locked tiles,
+   # score and game state, without the active tetromino and the display state
+   # (e.g., for trying a placement of a tetromino without changing this grid)
+   def copy(self):
+      grid = GameGrid.__new__(GameGrid)
+      grid.__dict__.update(self.__dict__)
+      grid.cells = self.cells.copy()
+      grid.row_order = self.row_order.copy()
+      grid.row_masks = list(self.row_masks)
+      grid.column_heights = list(self.column_heights)
+      grid.row_sums = list(self.row_sums)
+      grid.exponent_counts = list(self.exponent_counts)
+      grid.dirty_columns = dict(self.dirty_columns)
+      grid.score_deltas = dict(self.score_deltas)
+      grid.current_tetromino = None
+      grid.background, grid.drawn_matrix, grid.drawn_next = None, None, None
+      grid.drawn_piece_cells, grid.drawn_score = {}, None
+      grid.full_redraw = True
+      return grid
+
+   # A method for marking the whole game display to be redrawn by the next
+   # call of the display method (e.g., after a menu is drawn on the canvas)
+   def invalidate(self):
+      self.full_redraw = True
+
+   # A method for displaying the game grid, only the parts of the display that
+   # changed since the previous call are redrawn and shown
    def display(self, tetro):
+      # draw the static parts of the display once and keep them as a picture
+      if self.background is None:
+         self.background = self.draw_background()
+         self.full_redraw = True
+      # restore the whole background, everything else is redrawn below
+      if self.full_redraw:
+         stddraw.picture(self.background)
+         stddraw.invalidate()
+         self.drawn_matrix = np.zeros_like(self.cells)
+         self.drawn_piece_cells, self.drawn_score, self.drawn_next = {}, None, None
+         self.full_redraw = False
+      # the cells of the current/active tetromino if it is not None
+      # (the case when the game grid is updated)
+      piece_cells = {}
+      if self.current_tetromino is not None:
+         piece_cells = self.current_tetromino.get_cells()
+      # the locked cells that changed, and the old and new cells of the piece
+      tile_matrix = self.tile_matrix
+      rows, cols = np.nonzero(tile_matrix != self.drawn_matrix)
+      dirty_cells = set(zip(cols.tolist(), rows.tolist()))
+      dirty_cells.update(self.drawn_piece_cells, piece_cells)
+      if dirty_cells:
+         # redraw the dirty cells over their background
+         self.draw_cells(dirty_cells, piece_cells, tile_matrix)
+         # draw a box around the game grid over the redrawn cells
+         self.draw_boundaries()
+      self.drawn_matrix, self.drawn_piece_cells = tile_matrix, piece_cells
+      # redraw the score and the next piece only when they change
+      if self.score != self.drawn_score:
+         self.draw_score()
+         self.drawn_score = self.score
+      if tetro is not self.drawn_next:
+         self.draw_next(tetro)
+         self.drawn_next = tetro
+      # show the changed regions (the game loop schedules the next frame)
+      stddraw.showInvalidated()
+
+   # A method for drawing the static parts of the display (the grid lines,
+   # the right panel with its texts and the boundaries) and returning them as
+   # a picture
+   def draw_background(self):
       # clear the background to empty_cell_color
       stddraw.clear(self.empty_cell_color)
       # draw the game grid
       self.draw_grid()
       # draw the right panel
       self.draw_right_panel()
-      # draw the score panel
-      self.draw_score()
-      # draw the next piece
-      self.draw_next(tetro)
-
-      # draw the current/active tetromino if it is not None
-      # (the case when the game grid is updated)
-      if self.current_tetromino is not None:
-         self.current_tetromino.draw()
+      # draw the texts of the right panel
+      self.draw_panel_texts()
       # draw a box around the game grid
       self.draw_boundaries()
-      # show the resulting drawing with a pause duration = 250 ms
-      stddraw.show(self.speed)
+      return stddraw.snapshot()
+
+   # A method for redrawing the given (column, row) cells, each with the number
+   # of the active tetromino's tile on it (given in piece_cells), or else with
+   # its locked tile (given in tile_matrix as an exponent)
+   def draw_cells(self, cells, piece_cells, tile_matrix):
+      # restore the backgrounds of the cells and mark them to be shown
+      cols, rows = np.array(list(cells)).T
+      stddraw.restoreRegions(self.background, cols - 0.5, rows - 0.5, 1, 1)
+      stddraw.invalidateRegions(cols - 0.5, rows - 0.5, 1, 1)
+      # draw the pictures of the tiles in the cells that are not empty
+      sprites, xs, ys = [], [], []
+      for col, row in cells:
+         number = piece_cells.get((col, row))
+         if number is None and tile_matrix[row, col] != 0:
+            number = 1 << int(tile_matrix[row, col])
+         if number is not None:
+            sprites.append(Tile.get_sprite(number))
+            xs.append(col)
+            ys.append(row)
+      stddraw.pictures(sprites, xs, ys)
 
    def draw_next(self, next_tetro):
-      # for each cell of the next tetromino
-      for row in range(len(next_tetro.tile_matrix)):
-         for col in range(len(next_tetro.tile_matrix[0])):
-            # finds the tiles to draw
-            if next_tetro.tile_matrix[row][col] is not None:
-               # calculates the positions to draw into
-               y = next_tetro.grid_height - row - 15
-               x = next_tetro.grid_width + col + 1
-               next_tetro.tile_matrix[row][col].draw(Point(x, y))
-      stddraw.setPenRadius()
+      # restore the background of the next piece box and mark it to be shown
+      x, y = self.grid_width + 0.5, self.grid_height - 18.5
+      stddraw.restoreRegion(self.background, x, y, 4, 4)
+      stddraw.invalidate(x, y, 4, 4)
+      # draw the pictures of the tiles of the next tetromino at the positions
+      # computed from their cells in the tile matrix
+      sprites, xs, ys = [], [], []
+      for (col, row), tile in next_tetro.get_tiles():
+         sprites.append(Tile.get_sprite(tile.number))
+         xs.append(next_tetro.grid_width + col + 1)
+         ys.append(next_tetro.grid_height - row - 15)
+      stddraw.pictures(sprites, xs, ys)
 
-   # A method for drawing the score, and other textual elements into the right panel.
+   # A method for drawing the score into the right panel.
    def draw_score(self):
+      # restore the background of the score value and mark it to be shown
+      x, y = self.grid_width + 0.05, self.grid_height - 4.75
+      w = self.right_panel_width - 0.55
+      stddraw.restoreRegion(self.background, x, y, w, 1.5)
+      stddraw.invalidate(x, y, w, 1.5)
       # Set the color for the score display
-      stddraw.setPenColor(Color(160, 109, 130))
+      stddraw.setPenColor(getColor(160, 109, 130))
       stddraw.setFontFamily("Unbounded")
-      # Set the font size for the score display
-      stddraw.setFontSize(65)
-      # Draw the score on the right panel
-      stddraw.text(self.grid_width + self.right_panel_width // 2, self.grid_height - 2.5, "SCORE")
       # Draw the actual score value below the "Score: " text
       stddraw.setFontSize(50)
       stddraw.text(self.grid_width + self.right_panel_width // 2, self.grid_height - 4, str(self.score))
-      # Draw instructions to pause the game.
+
+   # A method for drawing the static textual elements into the right panel.
+   def draw_panel_texts(self):
+      # Set the color for the score display
+      stddraw.setPenColor(getColor(160, 109, 130))
+      stddraw.setFontFamily("Unbounded")
+      # Set the font size for the score display
+      stddraw.setFontSize(65)
+      # Draw the score title on the right panel
+      stddraw.text(self.grid_width + self.right_panel_width // 2, self.grid_height - 2.5, "SCORE")
+      # Draw instructions to pause the game, to hard drop and to rotate, and
+      # the next piece text (all centered on the right panel)
       stddraw.setFontSize(30)
-      stddraw.text(self.grid_width + self.right_panel_width // 2, self.grid_height - 7, "Press 'P'")
-      stddraw.text(self.grid_width + self.right_panel_width // 2, self.grid_height - 7.7, "to pause the game")
-      # Draw instructions to hard drop.
-      stddraw.text(self.grid_width + self.right_panel_width // 2, self.grid_height - 9.2, "Press 'H'")
-      stddraw.text(self.grid_width + self.right_panel_width // 2, self.grid_height - 9.9, "to hard drop")
-      # Draw instructions to rotate.
-      stddraw.text(self.grid_width + self.right_panel_width // 2, self.grid_height - 11.4, "Press 'SPACE'")
-      stddraw.text(self.grid_width + self.right_panel_width // 2, self.grid_height - 12.1, "to rotate piece")
-      # Draw next piece text.
-      stddraw.text(self.grid_width + self.right_panel_width // 2, self.grid_height - 14, "NEXT PIECE")
+      offsets = [7, 7.7, 9.2, 9.9, 11.4, 12.1, 14]
+      lines = ["Press 'P'", "to pause the game", "Press 'H'", "to hard drop",
+               "Press 'SPACE'", "to rotate piece", "NEXT PIECE"]
+      stddraw.texts(self.grid_width + self.right_panel_width // 2,
+                    self.grid_height - np.array(offsets), lines)
 
    # A method to draw the right panel.
    def draw_right_panel(self):
@@ -110,25 +265,18 @@ class GameGrid:
       # Reset the pen radius to its default value
       stddraw.setPenRadius()
 
-   # A method for drawing the cells and the lines of the game grid
+   # A method for drawing the lines of the game grid
    def draw_grid(self):
-      # for each cell of the game grid
-      for row in range(self.grid_height):
-         for col in range(self.grid_width):
-            # if the current grid cell is occupied by a tile
-            if self.tile_matrix[row][col] is not None:
-               # draw this tile
-               self.tile_matrix[row][col].draw(Point(col, row))
       # draw the inner lines of the game grid
       stddraw.setPenColor(self.line_color)
       stddraw.setPenRadius(self.line_thickness)
       # x and y ranges for the game grid
       start_x, end_x = -0.5, self.grid_width - 0.5
       start_y, end_y = -0.5, self.grid_height - 0.5
-      for x in np.arange(start_x + 1, end_x, 1):  # vertical inner lines
-         stddraw.line(x, start_y, x, end_y)
-      for y in np.arange(start_y + 1, end_y, 1):  # horizontal inner lines
-         stddraw.line(start_x, y, end_x, y)
+      xs = np.arange(start_x + 1, end_x, 1)  # vertical inner lines
+      stddraw.lines(xs, start_y, xs, end_y)
+      ys = np.arange(start_y + 1, end_y, 1)  # horizontal inner lines
+      stddraw.lines(start_x, ys, end_x, ys)
       stddraw.setPenRadius()  # reset the pen radius to its default value
 
    # A method for drawing the boundaries around the game grid
@@ -150,8 +298,39 @@ class GameGrid:
       # have tiles with position.y >= grid_height
       if not self.is_inside(row, col):
          return False  # the cell is not occupied as it is outside the grid
-      # the cell is occupied by a tile if it is not None
-      return self.tile_matrix[row][col] is not None
+      # the cell is occupied by a tile if its bit is set in the row bitmask
+      return (self.row_masks[row] >> col) & 1 == 1
+
+   # A method for checking whether the tiles given as the bitmasks of their
+   # rows relative to the cell (x, y) overlap any tile locked on the grid,
+   # piece_row_masks contains (dy, mask) pairs where bit k of mask is set for
+   # the tile in the cell (x + k, y + dy), and the tiles must be inside the
+   # grid horizontally and not below it
+   def overlaps(self, x, y, piece_row_masks):
+      row_masks = self.row_masks
+      for dy, mask in piece_row_masks:
+         row = y + dy
+         # the rows above the grid are not occupied
+         if row < self.grid_height and row_masks[row] & (mask << x):
+            return True
+      return False
+
+   # A method for checking whether the tiles given as the lowest (dx, dy)
+   # offset in each of their columns (the bottom profile of a piece) relative to
+   # the cell (x, y) are all above the highest tiles of their columns
+   def is_above_columns(self, x, y, bottom_profile):
+      heights = self.column_heights
+      for dx, dy in bottom_profile:
+         if y + dy < heights[x + dx]:
+            return False
+      return True
+
+   # A method that returns the y of the cell relative to which a piece with the
+   # given bottom profile lands when it is dropped from above the grid with
+   # this cell at column x (the tiles rest on the highest tiles or the bottom)
+   def get_landing_y(self, x, bottom_profile):
+      heights = self.column_heights
+      return max(heights[x + dx] - dy for dx, dy in bottom_profile)
 
    # A method for checking whether the cell with the given row and col indexes
    # is inside the game grid or not
@@ -164,98 +343,209 @@ class GameGrid:
    
    # A method for clearing full lines in the game grid
    def clear_full_lines(self):
-      rows_to_clear = []  # this variable list store the row indexes of full rows
-      for row in range(self.grid_height):
-        # this all method checks all cells in the current row are occupied
-         if all(self.tile_matrix[row]): 
-            rows_to_clear.append(row)  # add the index of the full row to the list
-      # we remove the full rows from the grid thanks to this for loop
-      for row in rows_to_clear:
-         # update the score with the values of each tile.
-         self.score += sum([tile.number for tile in self.tile_matrix[row] if tile is not None]) # SCORE UPDATE
-         self.tile_matrix = np.delete(self.tile_matrix, row, axis=0)
-         # add a new empty row at the top of the grid
-         new_row = np.full((1, self.grid_width), None)
-         self.tile_matrix = np.concatenate((self.tile_matrix, new_row), axis=0)#This effectively adds the new row to the top of the grid,
-                                                                               #shifting all existing rows down by one position.
+      # a row is full when all the bits of its bitmask are set
+      if self.full_row_mask not in self.row_masks:
+         return
+      full_rows = np.array([mask == self.full_row_mask for mask in self.row_masks])
+      cleared_rows = self.row_order[full_rows]
+      # update the score with the numbers of the tiles in all the full rows
+      points = sum(row_sum for row_sum, full in zip(self.row_sums, full_rows) if full)
+      self.add_score(points, "line_clear") # SCORE UPDATE
+      # remove the tiles in the full rows from the exponent counts
+      cleared_counts = np.bincount(self.cells[cleared_rows].ravel())
+      for exponent, count in enumerate(cleared_counts.tolist()):
+         self.exponent_counts[exponent] -= count
+      self.update_max_exponent()
+      # empty the cleared rows and reuse them as the new rows at the top, the
+      # remaining rows keep their order and shift down without being copied
+      self.cells[cleared_rows] = 0
+      self.row_order = np.concatenate((self.row_order[~full_rows], cleared_rows))
+      kept_masks = [mask for mask in self.row_masks if mask != self.full_row_mask]
+      self.row_masks = kept_masks + [0] * (self.grid_height - len(kept_masks))
+      kept_sums = [row_sum for row_sum, full in zip(self.row_sums, full_rows) if not full]
+      self.row_sums = kept_sums + [0] * (self.grid_height - len(kept_sums))
+      # update the column heights: each column is lowered by the number of
+      # cleared rows below its top, and only a column whose top tile was in a
+      # cleared row is scanned down for its new top tile (in the row bitmasks)
+      cleared = np.flatnonzero(full_rows).tolist()
+      heights = self.column_heights
+      for col, height in enumerate(heights):
+         if height == 0:
+            continue
+         new_height = height - bisect.bisect_left(cleared, height)
+         if (height - 1) in cleared:
+            bit = 1 << col
+            while new_height > 0 and not self.row_masks[new_height - 1] & bit:
+               new_height -= 1
+         heights[col] = new_height
+      # the columns with tiles moved down (above the lowest cleared row) may
+      # have new tiles to be merged from that row up
+      moved_tiles = 0
+      for mask in self.row_masks[cleared[0]:max(heights)]:
+         moved_tiles |= mask
+      for col in range(self.grid_width):
+         if moved_tiles >> col & 1:
+            self.dirty_columns[col] = min(self.dirty_columns.get(col, cleared[0]), cleared[0])
 
+   # A method for merging the vertically adjacent tiles with the same number
+   # in the dirty columns (the columns changed since they were last merged)
    def merge_tiles(self):
-      # Set merged to True to start the loop
-      merged = True
-      # Start a loop which continues as long as merged is True
-      while merged:
-         merged = False # Reset merged to False at the beginning of each loop iteration
-
-         # Iterate over each cell in the grid
-         for row in range(self.grid_height):
-            for col in range(self.grid_width):
-                  current_tile = self.tile_matrix[row][col] # Get the current tile at this position
-                  # Skip empty cells
-                  if current_tile is None:
-                     continue
-                  # Check if there is a neighboring tile with the same value
-                  # and merge them
-                  if row + 1 < self.grid_height and self.tile_matrix[row + 1][col] is not None and self.tile_matrix[row][col] is not None:
-                     # Check if the current tile has the same value as the one below it
-                     if current_tile.number == self.tile_matrix[row + 1][col].number:
-                        # If they have the same value, merge them
-                        current_tile.number *= 2 # Double the value of the current tile
-                        # Update the score with the new value
-                        self.score += current_tile.number # SCORE UPDATE
-                        self.tile_matrix[row + 1][col] = None # Remove the tile below
-                        self.tile_matrix[row ][col].change_color()  # Change the color of the merged tile
-                        merged = True # Set merged to True since a merge happened
-
-                        # Additional merging logic for tiles that are farther away
-                        if row + 2 < self.grid_height and self.tile_matrix[row + 2][col] is not None:
-                           # If the tile two cells below is not empty
-                           if self.tile_matrix[row + 1][col] is None:
-                              # Move it up
-                              self.tile_matrix[row + 1][col] = self.tile_matrix[row + 2][col]
-                              self.tile_matrix[row + 2][col] = None
-                              merged = True
-                        if row + 3 < self.grid_height and self.tile_matrix[row + 3][col] is not None:
-                           # If the tile three cells below is not empty
-                           if self.tile_matrix[row + 2][col] is None:
-                              # Move it up
-                              self.tile_matrix[row + 2][col] = self.tile_matrix[row + 3][col]
-                              self.tile_matrix[row + 3][col] = None 
-                              merged = True
-                                                
+      for col, lowest_row in self.dirty_columns.items():
+         self.merge_column(col, lowest_row)
+      self.dirty_columns.clear()
+
+   # A method for merging the vertically adjacent tiles with the same number
+   # in a given column: the passes from the bottom row to the top row are
+   # repeated until no tiles are merged, and in each pass the lower tile of two
+   # tiles with the same number is doubled, the upper one is removed, and the
+   # tiles two and three cells above the lower tile move down into the gaps
+   # (the first pass starts from the row below the given lowest changed row,
+   # as the tiles below it were merged before, and each next pass starts from
+   # the row below the lowest tile merged in the previous pass, as a merge only
+   # changes the cells above the merged tile; the passes end at the highest
+   # tile of the column) (the passes are repeated instead of merging in one
+   # pass, as a single pass does not give the same tiles and score: a tile
+   # that moves down or doubles may then match the tile below it)
+   def merge_column(self, col, lowest_row=0):
+      top = self.column_heights[col]
+      first = max(lowest_row - 1, 0)
+      if top - first < 2:
+         return
+      column_rows = self.row_order[:top]
+      exponents = self.cells[column_rows, col].tolist()
+      merged_column = list(exponents)
+      # the lowest merged row (the rows below it are not changed)
+      lowest_merged = top
+      while first is not None:
+         pass_start, first = first, None
+         for row in range(pass_start, top - 1):
+            exponent = merged_column[row]
+            if exponent == 0 or merged_column[row + 1] != exponent:
+               continue
+            # double the value of the lower tile (increment its exponent) and
+            # remove the upper tile, two tiles are replaced with one tile
+            self.exponent_counts[exponent] -= 2
+            exponent += 1
+            self.exponent_counts[exponent] += 1
+            if exponent > self.max_exponent:
+               self.max_exponent = exponent
+            merged_column[row], merged_column[row + 1] = exponent, 0
+            # Update the score with the new value
+            self.add_score(1 << exponent, "merge") # SCORE UPDATE
+            # move the tile two cells above down into the removed tile's cell,
+            # and the tile three cells above down into the cell it leaves
+            if row + 2 < top and merged_column[row + 2] and merged_column[row + 1] == 0:
+               merged_column[row + 1], merged_column[row + 2] = merged_column[row + 2], 0
+            if row + 3 < top and merged_column[row + 3] and merged_column[row + 2] == 0:
+               merged_column[row + 2], merged_column[row + 3] = merged_column[row + 3], 0
+            if first is None:
+               first = max(row - 1, 0)
+               lowest_merged = min(lowest_merged, row)
+      if lowest_merged == top:
+         return
+      # store the merged tiles back into the changed rows of the column
+      self.cells[column_rows[lowest_merged:], col] = merged_column[lowest_merged:]
+      # update the bit of the column in the row bitmasks and the row sums
+      bit = 1 << col
+      for row in range(lowest_merged, top):
+         exponent, old_exponent = merged_column[row], exponents[row]
+         if exponent:
+            self.row_masks[row] |= bit
+         else:
+            self.row_masks[row] &= ~bit
+         if exponent != old_exponent:
+            self.row_sums[row] += (1 << exponent if exponent else 0) - \
+                                  (1 << old_exponent if old_exponent else 0)
+      # update the height of the column (the lowest merged tile stays, so the
+      # highest tile is not below it)
+      height = top
+      while not merged_column[height - 1]:
+         height -= 1
+      self.column_heights[col] = height
+
+   # A method for adding the given points to the score, recording them as
+   # gained from the given source ("merge" or "line_clear")
+   def add_score(self, points, source):
+      self.score += points
+      self.score_deltas[source] += points
+
+   # A method that returns the points gained by merging tiles and by clearing
+   # full lines when the last tetromino was locked
+   def get_score_deltas(self):
+      return dict(self.score_deltas)
+
+   # A method for updating the largest exponent on the grid after tiles are
+   # removed (it only decreases when no tile with it remains)
+   def update_max_exponent(self):
+      while self.max_exponent > 0 and self.exponent_counts[self.max_exponent] == 0:
+         self.max_exponent -= 1
+
+   # A property that returns the largest tile number on the grid (0 when the
+   # grid is empty)
+   @property
+   def max_tile(self):
+      return 1 << self.max_exponent if self.max_exponent else 0
+
    # A method that locks the tiles of a landed tetromino on the grid checking
    # if the game is over due to having any tile above the topmost grid row.
    # (This method returns True when the game is over and False otherwise.)
    def update_grid(self, tiles_to_lock, blc_position):
-      # necessary for the display method to stop displaying the tetromino
-      self.current_tetromino = None
-      # lock the tiles of the current tetromino (tiles_to_lock) on the grid
+      # compute the positions of the tiles (occupied cells) in tiles_to_lock
+      # on the game grid and lock their numbers
       n_rows, n_cols = len(tiles_to_lock), len(tiles_to_lock[0])
+      cells = []
       for col in range(n_cols):
          for row in range(n_rows):
-            # place each tile (occupied cell) onto the game grid
             if tiles_to_lock[row][col] is not None:
-               # compute the position of the tile on the game grid
-               pos = Point()
-               pos.x = blc_position.x + col
-               pos.y = blc_position.y + (n_rows - 1) - row
-               if self.is_inside(pos.y, pos.x):
-                  self.tile_matrix[pos.y][pos.x] = tiles_to_lock[row][col]
-               # the game is over if any placed tile is above the game grid
-               else:
-                  self.game_over = True
-      # search the number of every tile in the grid, if 2048 or higher, end the game.
-      for col in range(self.grid_width):
-         for row in range(self.grid_height):
-            if self.tile_matrix[row][col] is not None and self.tile_matrix[row][col].number >= 2048:
-               self.game_over = True
-               self.win = True
-               
+               cells.append((blc_position.x + col, blc_position.y + (n_rows - 1) - row,
+                             tiles_to_lock[row][col].number))
+      return self.lock_cells(cells)
+
+   # A method that locks the tiles of a landed tetromino given as the
+   # (column, row, number) values of its tiles (e.g., as returned by the
+   # get_locked_cells method of the tetromino) on the grid checking if the
+   # game is over. (This method returns True when the game is over and False
+   # otherwise.)
+   def lock_cells(self, cells):
+      # necessary for the display method to stop displaying the tetromino
+      self.current_tetromino = None
+      # reset the points gained by locking this tetromino
+      self.score_deltas = {"merge": 0, "line_clear": 0}
+      # place each tile onto the game grid
+      for x, y, number in cells:
+         if self.is_inside(y, x):
+            # store the exponent of the tile number
+            exponent = number.bit_length() - 1
+            # (a tile of a tetromino that overlaps the locked tiles when
+            # the game is over replaces the tile in its cell)
+            old_exponent = int(self.cells[self.row_order[y], x])
+            if old_exponent:
+               self.row_sums[y] -= 1 << old_exponent
+               self.exponent_counts[old_exponent] -= 1
+            self.cells[self.row_order[y], x] = exponent
+            self.row_sums[y] += number
+            self.exponent_counts[exponent] += 1
+            if exponent > self.max_exponent:
+               self.max_exponent = exponent
+            self.row_masks[y] |= 1 << x
+            self.column_heights[x] = max(self.column_heights[x], y + 1)
+            # the column of the tile needs to be merged from its row up
+            self.dirty_columns[x] = min(self.dirty_columns.get(x, y), y)
+         # the game is over if any placed tile is above the game grid
+         else:
+            self.game_over = True
+      # (a replaced tile may have had the largest exponent)
+      self.update_max_exponent()
       # merging tiles before clearing full lines
       self.merge_tiles()
+      # if any tile is 2048 or higher, the game is won and ends
+      if self.max_exponent >= GameGrid.win_exponent:
+         self.game_over = True
+         self.win = True
       # clear full lines in the game grid
       self.clear_full_lines()
       # return the value of the game_over flag
       return self.game_over
 
    def set_speed(self, speed):
-      self.speed = speed
\ No newline at end of file
+      self.speed = speed
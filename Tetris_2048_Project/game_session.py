@@ -0,0 +1,102 @@
+from game_grid import GameGrid  # the class for modeling the game grid
+from tetromino import Tetromino  # the class for modeling the tetrominoes
+import random  # used for creating tetrominoes with random types (shapes)
+import hashlib  # used for computing the hash of the game grid
+
+# A function for creating random shaped tetrominoes to enter the game grid by
+# using the given random number generator (a random.Random object, the random
+# module is used when it is not given)
+def create_tetromino(rng=None):
+   if rng is None:
+      rng = random
+   # the type (shape) of the tetromino is determined randomly
+   tetromino_types = ['I', 'O', 'Z','J', 'L', 'S','T']
+   random_index = rng.randint(0, len(tetromino_types) - 1)
+   random_type = tetromino_types[random_index]
+   # create and return the tetromino
+   tetromino = Tetromino(random_type, rng)
+   return tetromino
+
+# A class for modeling the state of one game (the game grid, the active
+# tetromino and the next tetromino) and the moves made in it, independently of
+# how the game is scheduled and displayed
+class GameSession:
+   # the keys that change the game (the keys applied by the apply_key method)
+   keys = ("left", "right", "down", "space", "h")
+
+   # A constructor that creates a new game with an empty game grid of the given
+   # size and the given speed (the time between two automatic moves down in ms),
+   # the random values of the game are generated from the given seed (a random
+   # seed is chosen when it is not given)
+   def __init__(self, grid_h, grid_w, right_panel_width, speed, seed=None):
+      # the random number generator used for creating all the tetrominoes and
+      # their tiles, so the game can be reproduced from its seed and its inputs
+      if seed is None:
+         seed = random.getrandbits(32)
+      self.seed = seed
+      self.rng = random.Random(seed)
+      # set the game grid dimension values stored and used in the Tetromino class
+      Tetromino.grid_height = grid_h
+      Tetromino.grid_width = grid_w
+      # create the game grid
+      self.grid = GameGrid(grid_h, grid_w, right_panel_width)
+      self.grid.set_speed(speed)
+      # create the first tetromino to enter the game grid
+      self.current_tetromino = create_tetromino(self.rng)
+      self.grid.current_tetromino = self.current_tetromino
+      # create the next tetromino
+      self.next_tetromino = create_tetromino(self.rng)
+      # the game is over when a tetromino is locked above the game grid or when
+      # the game is won
+      self.game_over = False
+      # the number of gravity steps made (the ticks of the game) and the inputs
+      # of the game as (tick, key) pairs, where each key is applied before the
+      # gravity step of its tick
+      self.tick = 0
+      self.inputs = []
+
+   # A method for applying a key typed by the user to the active tetromino
+   def apply_key(self, key_typed):
+      # record the keys that change the game
+      if key_typed in GameSession.keys:
+         self.inputs.append((self.tick, key_typed))
+      # if the left, right or down arrow key has been pressed, move the active
+      # tetromino in that direction by one (moving down is the soft drop that
+      # causes the tetromino to fall down faster)
+      if key_typed in ("left", "right", "down"):
+         self.current_tetromino.move(key_typed, self.grid)
+      # if the space key has been pressed, rotate the active tetromino clockwise
+      elif key_typed == "space":
+         self.current_tetromino.rotate_clockwise(self.grid)
+      # if the h key has been pressed, hard drop the active tetromino
+      elif key_typed == "h":
+         self.current_tetromino.move(key_typed, self.grid, hard_drop=True)
+
+   # A method for moving the active tetromino down by one (auto fall), locking
+   # it onto the grid when it cannot go down anymore and creating the next one
+   # (This method returns True when the game is over and False otherwise.)
+   def gravity_step(self):
+      self.tick += 1
+      if self.current_tetromino.move("down", self.grid):
+         return False
+      # update the game grid by locking the tiles of the landed tetromino
+      # (given as their positions on the grid and their numbers)
+      self.game_over = self.grid.lock_cells(self.current_tetromino.get_locked_cells())
+      if self.game_over:
+         return True
+      # updates to the next tetromino, after locking the current tetromino
+      self.current_tetromino = self.next_tetromino
+      self.grid.current_tetromino = self.current_tetromino
+      # creates the 'next' next tetromino
+      self.next_tetromino = create_tetromino(self.rng)
+      return False
+
+   # A method that returns the hash of the locked tiles on the game grid (as
+   # bytes), e.g. for checking that a replayed game ends on the same grid
+   def board_hash(self):
+      return hashlib.blake2b(self.grid.tile_matrix.tobytes(), digest_size=16).digest()
+
+   # A method for displaying the game grid with the active tetromino and the
+   # next tetromino
+   def display(self):
+      self.grid.display(self.next_tetromino)
@@ -9,9 +9,17 @@ objects.
 
 class Color:
     """
-    A Color object models an RGB color.
+    A Color object models an RGB color. Color objects are immutable
+    values that compare equal (and hash alike) when their components
+    are equal, so one object can be shared wherever a color is needed
+    (see getColor()).
     """
 
+    # A Color object stores only its three components (without a
+    # per-object dict). They are set only by the constructor and can
+    # be read with the getters or the r, g, and b properties.
+    __slots__ = ('_r', '_g', '_b')
+
     #-------------------------------------------------------------------
 
     def __init__(self, r=0, g=0, b=0):
@@ -19,9 +27,48 @@ class Color:
         Construct self such that it has the given red (r),
         green (g), and blue (b) components.
         """
-        self._r = r  # Red component
-        self._g = g  # Green component
-        self._b = b  # Blue component
+        object.__setattr__(self, '_r', r)  # Red component
+        object.__setattr__(self, '_g', g)  # Green component
+        object.__setattr__(self, '_b', b)  # Blue component
+
+    #-------------------------------------------------------------------
+
+    def __setattr__(self, name, value):
+        """
+        Raise an AttributeError, as Color objects are immutable.
+        """
+        raise AttributeError('Color objects are immutable')
+
+    #-------------------------------------------------------------------
+
+    def __delattr__(self, name):
+        """
+        Raise an AttributeError, as Color objects are immutable.
+        """
+        raise AttributeError('Color objects are immutable')
+
+    #-------------------------------------------------------------------
+
+    @property
+    def r(self):
+        """
+        The red component of self (read-only).
+        """
+        return self._r
+
+    @property
+    def g(self):
+        """
+        The green component of self (read-only).
+        """
+        return self._g
+
+    @property
+    def b(self):
+        """
+        The blue component of self (read-only).
+        """
+        return self._b
 
     #-------------------------------------------------------------------
 
@@ -58,6 +105,53 @@ class Color:
         return '(' + str(self._r) + ', ' + str(self._g) + ', ' + \
             str(self._b) + ')'
 
+    #-------------------------------------------------------------------
+
+    def __eq__(self, other):
+        """
+        Return True if other is a Color with the same components as
+        self, and False otherwise.
+        """
+        if not isinstance(other, Color):
+            return NotImplemented
+        return (self._r, self._g, self._b) == \
+            (other._r, other._g, other._b)
+
+    #-------------------------------------------------------------------
+
+    def __hash__(self):
+        """
+        Return the hash of the components of self.
+        """
+        return hash((self._r, self._g, self._b))
+
+    #-------------------------------------------------------------------
+
+    def __reduce__(self):
+        """
+        Return the class and the components of self, so copies and
+        pickles of self are constructed instead of assigned to.
+        """
+        return (self.__class__, (self._r, self._g, self._b))
+
+#-----------------------------------------------------------------------
+
+# The palette of shared Color objects, keyed by their components.
+
+_palette = {}
+
+def getColor(r=0, g=0, b=0):
+    """
+    Return the shared Color object that has the given red (r), green
+    (g), and blue (b) components, creating it the first time it is
+    needed.
+    """
+    key = (r, g, b)
+    c = _palette.get(key)
+    if c is None:
+        c = _palette[key] = Color(r, g, b)
+    return c
+
 #-----------------------------------------------------------------------
 
 # Some predefined Color objects:
@@ -104,6 +198,12 @@ def _main():
     print(c1.getRed())
     print(c1.getGreen())
     print(c1.getBlue())
+    print(c1 == Color(0, 128, 255))
+    print(getColor(0, 128, 255) is getColor(0, 128, 255))
+    try:
+        c1.r = 255
+    except AttributeError as e:
+        print(e)
 
 if __name__ == '__main__':
     _main()
\ No newline at end of file
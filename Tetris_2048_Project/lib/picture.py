@@ -7,6 +7,7 @@ The picture module defines the Picture class.
 #-----------------------------------------------------------------------
 
 import os
+import threading
 try:
     import lib.color as color
 except ModuleNotFoundError:
@@ -98,3 +99,77 @@ class Picture:
         """
         pygameColor = pygame.Color(c.getRed(), c.getGreen(), c.getBlue(), 0)
         self._surface.set_at((x, y), pygameColor)
+
+#-----------------------------------------------------------------------
+
+# The process-wide cache of the images read from files. It maps the
+# absolute name of each file to a list with the modification time of
+# the file when it was read, the surface with its image, and whether
+# the surface was converted to the pixel format of the display.
+
+_assetCache = {}
+_assetLock = threading.Lock()
+
+def _cachedSurface(path, convert):
+    """
+    Return the surface with the image in the file whose absolute name
+    is path from the asset cache, reading the file only if it is not
+    in the cache or it was modified since it was read. If convert is
+    True, the surface is converted to the pixel format of the display
+    (once, when there is a display).
+    """
+    try:
+        mtime = os.path.getmtime(path)
+        with _assetLock:
+            entry = _assetCache.get(path)
+            if (entry is None) or (entry[0] != mtime):
+                entry = [mtime, pygame.image.load(path), False]
+                _assetCache[path] = entry
+            if convert and (not entry[2]) and \
+                    (pygame.display.get_surface() is not None):
+                if entry[1].get_flags() & pygame.SRCALPHA:
+                    entry[1] = entry[1].convert_alpha()
+                else:
+                    entry[1] = entry[1].convert()
+                entry[2] = True
+            return entry[1]
+    except (OSError, pygame.error):
+        raise IOError()
+
+def load(fileName):
+    """
+    Return a Picture object with the image in the file whose name is
+    fileName. The file is read only the first time and after it is
+    modified, and its image is converted to the pixel format of the
+    display for faster drawing. The returned Picture shares its
+    pixels with the cache, so it must not be modified.
+    """
+    pic = Picture.__new__(Picture)
+    pic._surface = _cachedSurface(os.path.abspath(fileName), True)
+    return pic
+
+def preload(fileNames, background=True):
+    """
+    Read the images in the files whose names are in fileNames into the
+    cache used by load(). If background is True, the files are read in
+    a background thread, which is returned (its join() method waits
+    until all the files are read); otherwise they are read before
+    returning None.
+    """
+    paths = [os.path.abspath(fileName) for fileName in fileNames]
+    def readAll():
+        for path in paths:
+            _cachedSurface(path, False)
+    if not background:
+        readAll()
+        return None
+    thread = threading.Thread(target=readAll, daemon=True)
+    thread.start()
+    return thread
+
+def clearCache():
+    """
+    Remove all the images from the cache used by load().
+    """
+    with _assetLock:
+        _assetCache.clear()
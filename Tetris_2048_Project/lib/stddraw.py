@@ -10,6 +10,14 @@ commonly used Color objects defined in the color module.
 import time
 import os
 import sys
+import math
+import collections
+import numpy
+import queue
+import threading
+import atexit
+import struct
+import zlib
 
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = 'hide'
 import pygame
@@ -66,6 +74,12 @@ except ModuleNotFoundError:
     from color import BOOK_LIGHT_BLUE
     from color import BOOK_RED
 
+# The picture module is used for creating pictures from drawings.
+try:
+    import lib.picture as picturemodule
+except ModuleNotFoundError:
+    import picture as picturemodule
+
 #-----------------------------------------------------------------------
 
 # Default Sizes and Values
@@ -83,6 +97,25 @@ _DEFAULT_PEN_COLOR = BLACK
 _DEFAULT_FONT_FAMILY = 'Helvetica'
 _DEFAULT_FONT_SIZE = 12
 
+# The maximum numbers of Font objects and rendered text surfaces that
+# are kept in the least recently used caches of the text functions.
+_FONT_CACHE_SIZE = 32
+_TEXT_CACHE_SIZE = 1024
+
+# The maximum number of color.Color to pygame.Color conversions that
+# are kept in the color cache (it is emptied when it is full).
+_COLOR_CACHE_SIZE = 1024
+
+# Rendering backends. WINDOW draws into a pygame display window,
+# OFFSCREEN draws into a plain surface that is never displayed, and
+# NULL does not draw at all. The backend can be selected by setting
+# the STDDRAW_BACKEND environment variable or by calling setBackend().
+
+WINDOW = 'window'
+OFFSCREEN = 'offscreen'
+NULL = 'null'
+_BACKENDS = (WINDOW, OFFSCREEN, NULL)
+
 _xmin = None
 _ymin = None
 _xmax = None
@@ -95,11 +128,55 @@ _canvasWidth = float(_DEFAULT_CANVAS_SIZE)
 _canvasHeight = float(_DEFAULT_CANVAS_SIZE)
 _penRadius = None
 _penColor = _DEFAULT_PEN_COLOR
-_keysTyped = []
+_penPygameColor = None  # _penColor converted to a pygame.Color
+
+# The maximum numbers of keys typed and key events that are kept in
+# their queues. When a queue is full, its oldest entries are dropped.
+_KEY_QUEUE_SIZE = 256
+
+# Types of the key events
+KEY_PRESSED = 'pressed'
+KEY_RELEASED = 'released'
+KEY_REPEATED = 'repeated'
+
+# The queue of the keys typed, and the queue of the key events as
+# (time, type, key) tuples, where time is a time.perf_counter() value
+# and type is KEY_PRESSED, KEY_RELEASED or KEY_REPEATED.
+_keysTyped = collections.deque(maxlen=_KEY_QUEUE_SIZE)
+_keyEvents = collections.deque(maxlen=_KEY_QUEUE_SIZE)
+
+# Auto repeat of held keys: the delay before the first repeat and the
+# interval between repeats in seconds (None when disabled), the keys
+# that are repeated (None for all keys), and the time of the next
+# repeat of each held key.
+_keyRepeatDelay = None
+_keyRepeatInterval = None
+_keyRepeatKeys = None
+_keysHeld = {}
+
+# Least recently used caches of Font objects keyed by (family, size,
+# bold) and of rendered text surfaces keyed by (family, size, bold,
+# string, color), and their hit and miss counters.
+_fontCache = collections.OrderedDict()
+_textCache = collections.OrderedDict()
+_textCacheStats = {'fontHits': 0, 'fontMisses': 0,
+                   'textHits': 0, 'textMisses': 0}
+
+# The regions (pygame.Rect objects) of the background canvas that were
+# marked with invalidate() and are copied by showInvalidated().
+_dirtyRects = []
 
 # Has the window been created?
 _windowCreated = False
 
+# Has the window been exposed since isExposed() was last called?
+_exposed = False
+
+# The selected rendering backend
+_backend = os.environ.get('STDDRAW_BACKEND', WINDOW).lower()
+if _backend not in _BACKENDS:
+    raise Exception('Unknown STDDRAW_BACKEND: ' + _backend)
+
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
 #-----------------------------------------------------------------------
@@ -118,7 +195,12 @@ _mousePos = None
 
 #-----------------------------------------------------------------------
 
-def _pygameColor(c):
+# The cache of the pygame.Color objects equivalent to color.Color
+# objects.
+
+_colorCache = {}
+
+def _convertColor(c):
     """
     Convert c, an object of type color.Color, to an equivalent object
     of type pygame.Color.  Return the result.
@@ -128,6 +210,20 @@ def _pygameColor(c):
     b = c.getBlue()
     return pygame.Color(r, g, b)
 
+def _pygameColor(c):
+    """
+    Return an object of type pygame.Color that is equivalent to c, an
+    object of type color.Color, converting c only if it is not in the
+    color cache. The returned object is shared and must not be
+    modified.
+    """
+    pc = _colorCache.get(c)
+    if pc is None:
+        if len(_colorCache) >= _COLOR_CACHE_SIZE:
+            _colorCache.clear()
+        pc = _colorCache[c] = _convertColor(c)
+    return pc
+
 #-----------------------------------------------------------------------
 
 # Private functions to scale and factor X and Y values.
@@ -180,12 +276,59 @@ def setCanvasSize(w=_DEFAULT_CANVAS_SIZE, h=_DEFAULT_CANVAS_SIZE):
 
     _canvasWidth = w
     _canvasHeight = h
-    _background = pygame.display.set_mode([w, h])
-    pygame.display.set_caption('stddraw window (r-click to save)')
-    _surface = pygame.Surface((w, h))
-    _surface.fill(_pygameColor(WHITE))
+    _background = None
+    _surface = None
+    if _backend == WINDOW:
+        _background = pygame.display.set_mode([w, h])
+        pygame.display.set_caption('stddraw window (r-click to save)')
+    if _backend != NULL:
+        _surface = pygame.Surface((w, h))
+        _surface.fill(_pygameColor(WHITE))
     _windowCreated = True
 
+    # Start recording if a recording path is given in the STDDRAW_RECORD
+    # environment variable (raw video for a .raw file, PNG files else).
+    recordPath = os.environ.get('STDDRAW_RECORD')
+    if recordPath:
+        if recordPath.endswith('.raw'):
+            startRecording(recordPath, RAW)
+        else:
+            startRecording(recordPath, PNG)
+
+def setBackend(backend=WINDOW):
+    """
+    Set the rendering backend to backend, which must be one of
+    stddraw.WINDOW, stddraw.OFFSCREEN or stddraw.NULL. Calling this
+    function is optional. If you call it, you must do so before
+    calling setCanvasSize() or any drawing function. With the OFFSCREEN
+    and NULL backends no window is opened, show() does not wait and
+    no events are polled; the NULL backend also turns all drawing
+    functions into no-ops.
+    """
+    global _backend
+
+    if _windowCreated:
+        raise Exception('The stddraw window already was created')
+
+    if backend not in _BACKENDS:
+        raise Exception('Unknown backend: ' + str(backend))
+
+    _backend = backend
+    _installBackend()
+
+def getBackend():
+    """
+    Return the rendering backend in use.
+    """
+    return _backend
+
+def isHeadless():
+    """
+    Return True if the rendering backend does not display a window,
+    and False otherwise.
+    """
+    return _backend != WINDOW
+
 def setXscale(min=_DEFAULT_XMIN, max=_DEFAULT_XMAX):
     """
     Set the x-scale of the canvas such that the minimum x value
@@ -235,7 +378,9 @@ def setPenColor(c=_DEFAULT_PEN_COLOR):
     c defaults to stddraw.BLACK.
     """
     global _penColor
+    global _penPygameColor
     _penColor = c
+    _penPygameColor = _pygameColor(c)
 
 def setFontFamily(f=_DEFAULT_FONT_FAMILY):
     """
@@ -274,7 +419,7 @@ def _pixel(x, y):
         _surface,
         int(round(xs)),
         int(round(xy)),
-        _pygameColor(_penColor))
+        _penPygameColor)
 
 def point(x, y):
     """
@@ -291,7 +436,7 @@ def point(x, y):
         ys = _scaleY(y)
         pygame.draw.ellipse(
             _surface,
-            _pygameColor(_penColor),
+            _penPygameColor,
             pygame.Rect(
                 xs-_penRadius,
                 ys-_penRadius,
@@ -319,7 +464,7 @@ def line(x0, y0, x1, y1):
     y1s = _scaleY(y1)
     pygame.draw.line(
        _surface,
-       _pygameColor(_penColor),
+       _penPygameColor,
        (x0s, y0s),
        (x1s, y1s),
        int(round(lineWidth)))
@@ -343,7 +488,7 @@ def circle(x, y, r):
         ys = _scaleY(y)
         pygame.draw.ellipse(
             _surface,
-            _pygameColor(_penColor),
+            _penPygameColor,
             pygame.Rect(xs-ws/2.0, ys-hs/2.0, ws, hs),
             int(round(_penRadius)))
 
@@ -366,7 +511,7 @@ def filledCircle(x, y, r):
         ys = _scaleY(y)
         pygame.draw.ellipse(
             _surface,
-            _pygameColor(_penColor),
+            _penPygameColor,
             pygame.Rect(xs-ws/2.0, ys-hs/2.0, ws, hs),
             0)
 
@@ -391,7 +536,7 @@ def rectangle(x, y, w, h):
         ys = _scaleY(y)
         pygame.draw.rect(
             _surface,
-            _pygameColor(_penColor),
+            _penPygameColor,
             pygame.Rect(xs, ys-hs, ws, hs),
             int(round(_penRadius)))
 
@@ -416,7 +561,7 @@ def filledRectangle(x, y, w, h):
         ys = _scaleY(y)
         pygame.draw.rect(
             _surface,
-            _pygameColor(_penColor),
+            _penPygameColor,
             pygame.Rect(xs, ys-hs, ws, hs),
             0)
 
@@ -456,7 +601,7 @@ def polygon(x, y):
     points.append((xScaled[0], yScaled[0]))
     pygame.draw.polygon(
         _surface,
-        _pygameColor(_penColor),
+        _penPygameColor,
         points,
         int(round(_penRadius)))
 
@@ -478,7 +623,44 @@ def filledPolygon(x, y):
     for i in range(len(x)):
         points.append((xScaled[i], yScaled[i]))
     points.append((xScaled[0], yScaled[0]))
-    pygame.draw.polygon(_surface, _pygameColor(_penColor), points, 0)
+    pygame.draw.polygon(_surface, _penPygameColor, points, 0)
+
+def _font(fontKey):
+    """
+    Return the Font object for fontKey, a (family, size, bold) tuple,
+    creating it if it is not in the font cache.
+    """
+    font = _fontCache.get(fontKey)
+    if font is None:
+        _textCacheStats['fontMisses'] += 1
+        font = pygame.font.SysFont(*fontKey)
+        _fontCache[fontKey] = font
+        if len(_fontCache) > _FONT_CACHE_SIZE:
+            _fontCache.popitem(last=False)
+    else:
+        _textCacheStats['fontHits'] += 1
+        _fontCache.move_to_end(fontKey)
+    return font
+
+def _textSurface(s, bold):
+    """
+    Return a surface with string s rendered in the current font and
+    pen color, rendering it if it is not in the text cache.
+    """
+    fontKey = (_fontFamily, _fontSize, bold)
+    c = _penColor
+    key = (fontKey, s, c)
+    surface = _textCache.get(key)
+    if surface is None:
+        _textCacheStats['textMisses'] += 1
+        surface = _font(fontKey).render(s, 1, _pygameColor(c))
+        _textCache[key] = surface
+        if len(_textCache) > _TEXT_CACHE_SIZE:
+            _textCache.popitem(last=False)
+    else:
+        _textCacheStats['textHits'] += 1
+        _textCache.move_to_end(key)
+    return surface
 
 def text(x, y, s):
     """
@@ -489,8 +671,7 @@ def text(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _textSurface(s, False)
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
 
@@ -503,11 +684,30 @@ def boldText(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize, True)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _textSurface(s, True)
     textpos = text.get_rect(center=(xs, ys))
     _surface.blit(text, textpos)
 
+def textCacheInfo():
+    """
+    Return a dictionary with the hit and miss counters and the current
+    sizes of the font cache and the rendered text cache.
+    """
+    info = dict(_textCacheStats)
+    info['fontCacheSize'] = len(_fontCache)
+    info['textCacheSize'] = len(_textCache)
+    return info
+
+def clearTextCache():
+    """
+    Empty the font cache and the rendered text cache and reset their
+    hit and miss counters.
+    """
+    _fontCache.clear()
+    _textCache.clear()
+    for key in _textCacheStats:
+        _textCacheStats[key] = 0
+
 def picture(pic, x=None, y=None):
     """
     Draw pic on the background canvas centered at (x, y).  pic is an
@@ -530,6 +730,251 @@ def picture(pic, x=None, y=None):
     picSurface = pic._surface # violates encapsulation
     _surface.blit(picSurface, [xs-ws/2.0, ys-hs/2.0, ws, hs])
 
+def scaledSize(w, h):
+    """
+    Return the size in pixels, as a (width, height) tuple of integers,
+    of a rectangle of width w and height h in user coordinates.
+    """
+    return (max(1, int(round(_factorX(float(w))))),
+            max(1, int(round(_factorY(float(h))))))
+
+def renderPicture(w, h, draw):
+    """
+    Return a picture.Picture object of width w and height h in user
+    coordinates that contains the drawing made by calling draw(). While
+    draw() is running, all drawing functions draw into the picture and
+    the origin (0, 0) of the user coordinates is the picture's center.
+    The picture can then be drawn many times with picture(), which is
+    much faster than repeating the drawing.
+    """
+    global _surface
+    global _xmin
+    global _xmax
+    global _ymin
+    global _ymax
+    _makeSureWindowCreated()
+    ws, hs = scaledSize(w, h)
+    pic = picturemodule.Picture(ws, hs)
+    saved = (_surface, _xmin, _xmax, _ymin, _ymax)
+    # Keep the scale and move the origin to the center of the picture.
+    xSpan = _xmax - _xmin
+    ySpan = _ymax - _ymin
+    _xmin = -ws / 2.0 * xSpan / _canvasWidth
+    _xmax = _xmin + xSpan
+    _ymax = hs / 2.0 * ySpan / _canvasHeight
+    _ymin = _ymax - ySpan
+    _surface = pic._surface # violates encapsulation
+    try:
+        draw()
+    finally:
+        _surface, _xmin, _xmax, _ymin, _ymax = saved
+    # Convert the picture to the pixel format of the window for faster
+    # blitting.
+    if _backend == WINDOW:
+        pic._surface = pic._surface.convert()
+    return pic
+
+def _pixelRect(x, y, w, h):
+    """
+    Return the smallest pygame.Rect in pixels that covers the rectangle
+    of width w and height h whose lower left point is (x, y).
+    """
+    left = math.floor(_scaleX(x))
+    top = math.floor(_scaleY(y + h))
+    right = math.ceil(_scaleX(x + w))
+    bottom = math.ceil(_scaleY(y))
+    return pygame.Rect(left, top, right - left, bottom - top)
+
+def snapshot():
+    """
+    Return a picture.Picture object with a copy of the background
+    canvas, e.g. for restoring parts of a static background later
+    with restoreRegion().
+    """
+    _makeSureWindowCreated()
+    pic = picturemodule.Picture(int(_canvasWidth), int(_canvasHeight))
+    pic._surface.blit(_surface, (0, 0)) # violates encapsulation
+    return pic
+
+def restoreRegion(pic, x, y, w, h):
+    """
+    Copy the rectangle of width w and height h whose lower left point
+    is (x, y) from pic, a picture.Picture object returned by snapshot(),
+    to the same place on the background canvas.
+    """
+    _makeSureWindowCreated()
+    rect = _pixelRect(float(x), float(y), float(w), float(h))
+    _surface.blit(pic._surface, rect, rect) # violates encapsulation
+
+def invalidate(x=None, y=None, w=None, h=None):
+    """
+    Mark the rectangle of width w and height h whose lower left point
+    is (x, y) as changed, so that it is copied to the window canvas by
+    the next call to showInvalidated(). Without arguments, the whole
+    background canvas is marked.
+    """
+    _makeSureWindowCreated()
+    if x is None:
+        _dirtyRects.append(pygame.Rect(0, 0, _canvasWidth, _canvasHeight))
+    else:
+        _dirtyRects.append(_pixelRect(float(x), float(y), float(w), float(h)))
+
+#-----------------------------------------------------------------------
+
+# Functions to draw many shapes, texts, pictures or regions with one
+# call. Their coordinates are given as sequences or numpy arrays (or as
+# single numbers shared by all of them), they are scaled in one
+# vectorized step and then drawn in a tight loop.
+
+def _scaleXs(xs):
+    return _canvasWidth * (numpy.asarray(xs, dtype=float) - _xmin) / \
+        (_xmax - _xmin)
+
+def _scaleYs(ys):
+    return _canvasHeight * (_ymax - numpy.asarray(ys, dtype=float)) / \
+        (_ymax - _ymin)
+
+def _pygameColors(colors, n):
+    """
+    Return a list of n pygame.Color objects that are the conversions of
+    the color.Color objects in colors, or the pen color n times when
+    colors is None.
+    """
+    if colors is None:
+        return [_penPygameColor] * n
+    return [_pygameColor(c) for c in colors]
+
+def _pixelRects(xs, ys, w, h):
+    """
+    Return a list of the smallest pygame.Rect objects in pixels that
+    cover the rectangles of width w and height h whose lower left
+    points are (xs[i], ys[i]).
+    """
+    xs, ys = numpy.broadcast_arrays(numpy.asarray(xs, dtype=float),
+                                    numpy.asarray(ys, dtype=float))
+    w = float(w)
+    h = float(h)
+    lefts = numpy.floor(_scaleXs(xs)).astype(int).tolist()
+    tops = numpy.floor(_scaleYs(ys + h)).astype(int).tolist()
+    rights = numpy.ceil(_scaleXs(xs + w)).astype(int).tolist()
+    bottoms = numpy.ceil(_scaleYs(ys)).astype(int).tolist()
+    return [pygame.Rect(left, top, right - left, bottom - top)
+            for left, top, right, bottom in zip(lefts, tops, rights, bottoms)]
+
+def lines(xs0, ys0, xs1, ys1):
+    """
+    Draw on the background canvas the lines from (xs0[i], ys0[i]) to
+    (xs1[i], ys1[i]).
+    """
+    _makeSureWindowCreated()
+    xs0, ys0, xs1, ys1 = numpy.broadcast_arrays(
+        _scaleXs(xs0), _scaleYs(ys0), _scaleXs(xs1), _scaleYs(ys1))
+    lineWidth = _penRadius
+    if lineWidth == 0.0: lineWidth = 1.0
+    width = int(round(lineWidth))
+    color = _penPygameColor
+    drawLine = pygame.draw.line
+    for x0s, y0s, x1s, y1s in zip(xs0.tolist(), ys0.tolist(),
+                                  xs1.tolist(), ys1.tolist()):
+        drawLine(_surface, color, (x0s, y0s), (x1s, y1s), width)
+
+def _squares(xs, ys, r, colors, width):
+    """
+    Draw on the background canvas the squares whose sides are of
+    length 2r, centered on (xs[i], ys[i]), with the given colors (the
+    pen color when colors is None) and the given outline width (0 for
+    filled squares).
+    """
+    _makeSureWindowCreated()
+    r = float(r)
+    xs, ys = numpy.broadcast_arrays(numpy.asarray(xs, dtype=float),
+                                    numpy.asarray(ys, dtype=float))
+    ws = _factorX(2.0*r)
+    hs = _factorY(2.0*r)
+    pcs = _pygameColors(colors, xs.size)
+    lefts = _scaleXs(xs - r).ravel().tolist()
+    bottoms = _scaleYs(ys - r).ravel().tolist()
+    # If the squares are too small, then simply draw pixels.
+    if (ws <= 1.0) and (hs <= 1.0):
+        for left, bottom, pc in zip(lefts, bottoms, pcs):
+            pygame.gfxdraw.pixel(
+                _surface, int(round(left)), int(round(bottom)), pc)
+        return
+    drawRect = pygame.draw.rect
+    Rect = pygame.Rect
+    for left, bottom, pc in zip(lefts, bottoms, pcs):
+        drawRect(_surface, pc, Rect(left, bottom-hs, ws, hs), width)
+
+def squares(xs, ys, r, colors=None):
+    """
+    Draw on the background canvas the squares whose sides are of
+    length 2r, centered on (xs[i], ys[i]). The color of square i is
+    colors[i], colors defaults to the pen color for all the squares.
+    """
+    _squares(xs, ys, r, colors, int(round(_penRadius)))
+
+def filledSquares(xs, ys, r, colors=None):
+    """
+    Draw on the background canvas the filled squares whose sides are
+    of length 2r, centered on (xs[i], ys[i]). The color of square i is
+    colors[i], colors defaults to the pen color for all the squares.
+    """
+    _squares(xs, ys, r, colors, 0)
+
+def texts(xs, ys, strings, bold=False):
+    """
+    Draw strings[i] on the background canvas centered at (xs[i],
+    ys[i]) in the current font and pen color (bold when bold is True).
+    """
+    _makeSureWindowCreated()
+    xs, ys = numpy.broadcast_arrays(_scaleXs(xs), _scaleYs(ys))
+    for xScaled, yScaled, s in zip(xs.ravel().tolist(), ys.ravel().tolist(),
+                                   strings):
+        text = _textSurface(s, bold)
+        _surface.blit(text, text.get_rect(center=(xScaled, yScaled)))
+
+def pictures(pics, xs, ys):
+    """
+    Draw pics[i] on the background canvas centered at (xs[i], ys[i]).
+    pics is a sequence of picture.Picture objects, or one
+    picture.Picture object to draw at all the given points.
+    """
+    _makeSureWindowCreated()
+    xs, ys = numpy.broadcast_arrays(_scaleXs(xs), _scaleYs(ys))
+    xs = xs.ravel().tolist()
+    ys = ys.ravel().tolist()
+    if isinstance(pics, picturemodule.Picture):
+        pics = [pics] * len(xs)
+    blitSequence = []
+    for pic, xScaled, yScaled in zip(pics, xs, ys):
+        ws = pic.width()
+        hs = pic.height()
+        blitSequence.append((pic._surface, # violates encapsulation
+                             [xScaled-ws/2.0, yScaled-hs/2.0, ws, hs]))
+    _surface.blits(blitSequence, doreturn=False)
+
+def restoreRegions(pic, xs, ys, w, h):
+    """
+    Copy the rectangles of width w and height h whose lower left
+    points are (xs[i], ys[i]) from pic, a picture.Picture object
+    returned by snapshot(), to the same places on the background canvas.
+    """
+    _makeSureWindowCreated()
+    picSurface = pic._surface # violates encapsulation
+    _surface.blits([(picSurface, rect, rect)
+                    for rect in _pixelRects(xs, ys, w, h)], doreturn=False)
+
+def invalidateRegions(xs, ys, w, h):
+    """
+    Mark the rectangles of width w and height h whose lower left
+    points are (xs[i], ys[i]) as changed, so that they are copied to
+    the window canvas by the next call to showInvalidated().
+    """
+    _makeSureWindowCreated()
+    _dirtyRects.extend(_pixelRects(xs, ys, w, h))
+
+#-----------------------------------------------------------------------
+
 def clear(c=WHITE):
     """
     Clear the background canvas to color c, where c is an
@@ -564,8 +1009,27 @@ def _show():
     """
     _background.blit(_surface, (0, 0))
     pygame.display.flip()
+    del _dirtyRects[:]
     _checkForEvents()
 
+def _wait(msec):
+    """
+    Wait for msec milliseconds, but check for events every QUANTUM
+    seconds.
+    """
+    QUANTUM = .01
+    sec = msec / 1000.0
+    if sec <= 0.0:
+        return
+    if sec < QUANTUM:
+        time.sleep(sec)
+        return
+    secondsWaited = 0.0
+    while secondsWaited < sec:
+        time.sleep(QUANTUM)
+        secondsWaited += QUANTUM
+        _checkForEvents()
+
 def _showAndWaitForever():
     """
     Copy the background canvas to the window canvas. Then wait
@@ -583,25 +1047,240 @@ def show(msec=float('inf')):
     Copy the background canvas to the window canvas, and
     then wait for msec milliseconds. msec defaults to infinity.
     """
+    _makeSureWindowCreated()
+
+    # A headless canvas is never displayed, so there is nothing to wait for.
+    if _backend != WINDOW:
+        _captureFrame()
+        return
+
     if msec == float('inf'):
         _showAndWaitForever()
 
-    _makeSureWindowCreated()
     _show()
+    _captureFrame()
     _checkForEvents()
+    _wait(msec)
 
-    # Sleep for the required time, but check for events every
-    # QUANTUM seconds.
-    QUANTUM = .01
-    sec = msec / 1000.0
-    if sec < QUANTUM:
-        time.sleep(sec)
+def showInvalidated(msec=0.0):
+    """
+    Copy only the regions of the background canvas marked with
+    invalidate() since the last show to the window canvas, and then
+    wait for msec milliseconds. msec defaults to 0.
+    """
+    _makeSureWindowCreated()
+
+    # A headless canvas is never displayed, so there is nothing to wait for.
+    if _backend != WINDOW:
+        if _dirtyRects:
+            _captureFrame()
+        del _dirtyRects[:]
         return
-    secondsWaited = 0.0
-    while secondsWaited < sec:
-        time.sleep(QUANTUM)
-        secondsWaited += QUANTUM
-        _checkForEvents()
+
+    for rect in _dirtyRects:
+        _background.blit(_surface, rect, rect)
+    pygame.display.update(_dirtyRects)
+    if _dirtyRects:
+        _captureFrame()
+    del _dirtyRects[:]
+    _checkForEvents()
+    _wait(msec)
+
+#-----------------------------------------------------------------------
+
+# Functions to record the shown frames without stalling the drawing.
+# Each frame shown by show() or showInvalidated() is copied as raw RGB
+# bytes (it is not encoded) into a bounded queue that a background
+# thread drains to files. When the queue is full, the frame is dropped
+# and counted instead of waiting for the thread.
+
+PNG = 'png'
+RAW = 'raw'
+
+_DEFAULT_RECORD_QUEUE_SIZE = 64
+
+_recordQueue = None
+_recordThread = None
+_recordError = None
+_recordStats = {'captured': 0, 'dropped': 0, 'written': 0}
+
+def startRecording(path, format=PNG, queueSize=_DEFAULT_RECORD_QUEUE_SIZE):
+    """
+    Start recording the frames shown by show() and showInvalidated().
+    With format stddraw.PNG, frame i is saved to the PNG file named
+    path % i (e.g. path = 'frames/frame%05d.png'). With format
+    stddraw.RAW, the frames are appended to the file path as raw RGB
+    video (3 bytes per pixel, row by row, at the canvas size), which
+    can be converted e.g. with ffmpeg -f rawvideo -pix_fmt rgb24 -s WxH.
+    At most queueSize frames wait to be written, the frames shown while
+    the queue is full are dropped. Raise an exception if path cannot
+    be written to (its directory does not exist, or a PNG path has no
+    format specification for the frame number).
+    """
+    global _recordQueue
+    global _recordThread
+    global _recordError
+
+    if _recordThread is not None:
+        raise Exception('The frames already are being recorded')
+
+    if format not in (PNG, RAW):
+        raise Exception('Unknown recording format: ' + str(format))
+
+    rawFile = None
+    if format == PNG:
+        try:
+            firstPath = path % 0
+        except (TypeError, ValueError):
+            firstPath = path
+        if firstPath == path or firstPath == path % 1:
+            raise Exception('The PNG recording path must contain a format '
+                            'specification for the frame number, such as '
+                            '%05d: ' + path)
+        directory = os.path.dirname(firstPath)
+        if directory and not os.path.isdir(directory):
+            raise Exception('The recording directory does not exist: ' +
+                            directory)
+    else:
+        # Opening the file here reports a missing directory to the caller.
+        rawFile = open(path, 'wb')
+
+    _makeSureWindowCreated()
+    for key in _recordStats:
+        _recordStats[key] = 0
+    _recordError = None
+    size = (int(_canvasWidth), int(_canvasHeight))
+    _recordQueue = queue.Queue(queueSize)
+    _recordThread = threading.Thread(
+        target=_writeFrames,
+        args=(_recordQueue, path, rawFile, size),
+        daemon=True)
+    _recordThread.start()
+
+def stopRecording():
+    """
+    Stop recording, wait until the queued frames are written, and
+    return the dictionary returned by recordingInfo(). Raise the
+    exception that stopped the recording thread from writing the
+    frames, if any.
+    """
+    global _recordQueue
+    global _recordThread
+    global _recordError
+    if _recordThread is not None:
+        # The thread keeps draining the queue even after an error, but
+        # the queue is not waited for once the thread is not running.
+        while _recordThread.is_alive():
+            try:
+                _recordQueue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                pass
+        _recordThread.join()
+        _recordQueue = None
+        _recordThread = None
+    error, _recordError = _recordError, None
+    if error is not None:
+        raise error
+    return recordingInfo()
+
+def isRecording():
+    """
+    Return True if the shown frames are being recorded, and False
+    otherwise.
+    """
+    return _recordThread is not None
+
+def recordingInfo():
+    """
+    Return a dictionary with the numbers of the frames captured,
+    dropped (as the queue was full), written and waiting in the queue
+    since recording was last started.
+    """
+    info = dict(_recordStats)
+    info['queued'] = _recordQueue.qsize() if _recordQueue is not None else 0
+    return info
+
+def _captureFrame():
+    """
+    Copy the background canvas into the recording queue if frames are
+    being recorded, or count it as dropped if the queue is full.
+    """
+    if _recordQueue is None or _surface is None:
+        return
+    try:
+        _recordQueue.put_nowait(pygame.image.tobytes(_surface, 'RGB'))
+        _recordStats['captured'] += 1
+    except queue.Full:
+        _recordStats['dropped'] += 1
+
+def _writeFrames(frameQueue, path, rawFile, size):
+    """
+    Write the frames in frameQueue to rawFile, or to the PNG files
+    named path % i if rawFile is None, until None is taken from the
+    queue. Runs in the recording thread. If writing fails, the error is
+    kept for stopRecording() and the remaining frames are discarded.
+    """
+    global _recordError
+    index = 0
+    try:
+        while True:
+            frame = frameQueue.get()
+            if frame is None:
+                return
+            if _recordError is not None:
+                continue
+            try:
+                if rawFile is not None:
+                    rawFile.write(frame)
+                else:
+                    with open(path % index, 'wb') as pngFile:
+                        pngFile.write(_encodePng(frame, size))
+            except Exception as e:
+                _recordError = e
+                continue
+            index += 1
+            _recordStats['written'] += 1
+    finally:
+        if rawFile is not None:
+            rawFile.close()
+
+def _encodePng(frame, size):
+    """
+    Return the PNG file contents of frame, raw RGB bytes of an image
+    with the given (width, height) size. The pixels are compressed with
+    zlib, which (unlike pygame.image.save()) lets the other threads run
+    while it is compressing.
+    """
+    w, h = size
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + \
+            struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    # Each row of the image data starts with its filter type (0: none).
+    rows = numpy.frombuffer(frame, dtype=numpy.uint8).reshape(h, w * 3)
+    data = numpy.hstack((numpy.zeros((h, 1), dtype=numpy.uint8), rows))
+    return b'\x89PNG\r\n\x1a\n' + \
+        chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 2, 0, 0, 0)) + \
+        chunk(b'IDAT', zlib.compress(data.tobytes(), 1)) + \
+        chunk(b'IEND', b'')
+
+def _stopRecordingAtExit():
+    """
+    Stop recording when the program exits, reporting the error that
+    stopped the recording thread from writing the frames, if any, on
+    stderr (an exception raised in an atexit function is not reported
+    to the user as an error).
+    """
+    try:
+        stopRecording()
+    except Exception as e:
+        info = recordingInfo()
+        sys.stderr.write(
+            'stddraw: recording failed: %s (%d frames written, %d dropped)\n'
+            % (e, info['written'], info['dropped']))
+
+# Write the frames still in the queue when the program exits.
+atexit.register(_stopRecordingAtExit)
 
 #-----------------------------------------------------------------------
 
@@ -650,41 +1329,109 @@ def _checkForEvents():
     Check if any new event has occured (such as a key typed or button
     pressed).  If a key has been typed, then put that key in a queue.
     """
-    global _surface
-    global _keysTyped
-    
-    #-------------------------------------------------------------------
-    # Begin added by Alan J. Broder
-    #-------------------------------------------------------------------
+    _makeSureWindowCreated()
+
+    now = time.perf_counter()
+    for event in pygame.event.get():
+        _handleEvent(event, now)
+    _repeatHeldKeys(now)
+
+def _handleEvent(event, now):
+    """
+    Handle event, a pygame event that occured at time now (in seconds,
+    as returned by time.perf_counter()).
+    """
     global _mousePos
     global _mousePressed
-    #-------------------------------------------------------------------
+    global _exposed
+
+    if event.type == pygame.QUIT:
+        sys.exit()
+    elif event.type in (pygame.WINDOWEXPOSED, pygame.VIDEOEXPOSE):
+        _exposed = True
+    elif event.type == pygame.KEYDOWN:
+        key = pygame.key.name(event.key)
+        _keysTyped.append(key)
+        _keyEvents.append((now, KEY_PRESSED, key))
+        if (_keyRepeatDelay is not None) and \
+            ((_keyRepeatKeys is None) or (key in _keyRepeatKeys)):
+            _keysHeld[key] = now + _keyRepeatDelay
+    elif event.type == pygame.KEYUP:
+        key = pygame.key.name(event.key)
+        _keysHeld.pop(key, None)
+        _keyEvents.append((now, KEY_RELEASED, key))
+    elif (event.type == pygame.MOUSEBUTTONUP) and \
+        (event.button == 3):
+        _saveToFile()
+        
+    #---------------------------------------------------------------
+    # Begin added by Alan J. Broder
+    #---------------------------------------------------------------
+    # Every time the mouse button is pressed, remember
+    # the mouse position as of that press.
+    elif (event.type == pygame.MOUSEBUTTONDOWN) and \
+        (event.button == 1): 
+        _mousePressed = True
+        _mousePos = event.pos                      
+    #---------------------------------------------------------------
     # End added by Alan J. Broder
-    #-------------------------------------------------------------------
-    
+    #---------------------------------------------------------------
+
+def _repeatHeldKeys(now):
+    """
+    Repeat the held keys whose next repeat is due at time now.
+    """
+    for key, repeatTime in _keysHeld.items():
+        while repeatTime <= now:
+            _keysTyped.append(key)
+            _keyEvents.append((repeatTime, KEY_REPEATED, key))
+            repeatTime += _keyRepeatInterval
+        _keysHeld[key] = repeatTime
+
+def pollEvents():
+    """
+    Check for new events (such as keys typed or mouse buttons pressed)
+    without showing the background canvas or waiting. Calling this
+    function often keeps the input latency low while the canvas is
+    shown less often.
+    """
     _makeSureWindowCreated()
+    if _backend == WINDOW:
+        _checkForEvents()
 
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            sys.exit()
-        elif event.type == pygame.KEYDOWN:
-            _keysTyped = [pygame.key.name(event.key)] + _keysTyped
-        elif (event.type == pygame.MOUSEBUTTONUP) and \
-            (event.button == 3):
-            _saveToFile()
-            
-        #---------------------------------------------------------------
-        # Begin added by Alan J. Broder
-        #---------------------------------------------------------------
-        # Every time the mouse button is pressed, remember
-        # the mouse position as of that press.
-        elif (event.type == pygame.MOUSEBUTTONDOWN) and \
-            (event.button == 1): 
-            _mousePressed = True
-            _mousePos = event.pos                      
-        #---------------------------------------------------------------
-        # End added by Alan J. Broder
-        #---------------------------------------------------------------
+def waitForEvent(msec=None):
+    """
+    Wait until a new event (such as a key typed, a mouse button
+    pressed or the window exposed) occurs or msec milliseconds pass,
+    without using the CPU while waiting, and then check for the new
+    events as pollEvents() does. msec defaults to waiting without a
+    time limit. Return True if an event occured, and False otherwise.
+    As no event occurs on a headless canvas, return False right away.
+    """
+    _makeSureWindowCreated()
+    if _backend != WINDOW:
+        return False
+    if msec is None:
+        event = pygame.event.wait()
+    else:
+        event = pygame.event.wait(max(1, int(msec)))
+    now = time.perf_counter()
+    if event.type != pygame.NOEVENT:
+        _handleEvent(event, now)
+    _checkForEvents()
+    return event.type != pygame.NOEVENT
+
+def isExposed():
+    """
+    Return True if the window has been exposed (so its contents have
+    to be shown again, e.g. after it was covered) since the last time
+    isExposed was called, and False otherwise.
+    """
+    global _exposed
+    if _exposed:
+        _exposed = False
+        return True
+    return False
 
 #-----------------------------------------------------------------------
 
@@ -695,23 +1442,65 @@ def hasNextKeyTyped():
     Return True if the queue of the keys the user typed is not empty.
     Otherwise return False.
     """
-    global _keysTyped
-    return _keysTyped != []
+    return len(_keysTyped) != 0
 
 def nextKeyTyped():
     """
     Remove the first key from the queue of the keys that the user typed,
     and return that key.
     """
-    global _keysTyped
-    return _keysTyped.pop()
+    return _keysTyped.popleft()
 
 def clearKeysTyped():
     """
     Clear all the keys in the queue of the keys that the user typed.
     """
-    global _keysTyped
-    _keysTyped = []
+    _keysTyped.clear()
+
+def drainKeyEvents():
+    """
+    Remove all the key events from their queue and return them, in the
+    order they occurred, as an iterable of (time, type, key) tuples.
+    time is a time.perf_counter() value and type is one of
+    stddraw.KEY_PRESSED, stddraw.KEY_RELEASED and stddraw.KEY_REPEATED.
+    """
+    global _keyEvents
+    events = _keyEvents
+    _keyEvents = collections.deque(maxlen=_KEY_QUEUE_SIZE)
+    return events
+
+def clearKeyEvents():
+    """
+    Clear all the events in the queue of the key events and all the
+    keys in the queue of the keys that the user typed, and forget the
+    keys that are held.
+    """
+    _keyEvents.clear()
+    _keysTyped.clear()
+    _keysHeld.clear()
+
+def setKeyRepeat(delay=None, interval=None, keys=None):
+    """
+    Repeat a key that is held down for delay milliseconds every
+    interval milliseconds (delayed auto shift and auto repeat), as if
+    the key was typed again. If keys is not None, only the keys in keys
+    are repeated. Calling this function with no delay disables the
+    auto repeat.
+    """
+    global _keyRepeatDelay
+    global _keyRepeatInterval
+    global _keyRepeatKeys
+    _keysHeld.clear()
+    if delay is None:
+        _keyRepeatDelay = None
+        _keyRepeatInterval = None
+        _keyRepeatKeys = None
+        return
+    if (interval is None) or (interval <= 0):
+        raise Exception('interval must be positive')
+    _keyRepeatDelay = delay / 1000.0
+    _keyRepeatInterval = interval / 1000.0
+    _keyRepeatKeys = None if keys is None else frozenset(keys)
 
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
@@ -762,11 +1551,63 @@ def mouseY():
 
 #-----------------------------------------------------------------------
 
-# Initialize the x scale, the y scale, and the pen radius.
+# Functions that do nothing with the NULL backend
+
+def _noOp(*args, **kwargs):
+    """
+    Do nothing. Used in place of the drawing, showing and event
+    handling functions when the NULL backend is selected.
+    """
+    pass
+
+_nullPicture = None
+
+def _nullSnapshot():
+    """
+    Return an empty picture.Picture object. Used in place of snapshot()
+    when the NULL backend is selected, so that clients which keep the
+    snapshot of a static background (and draw it again only when it is
+    missing) draw it once, as with the other backends.
+    """
+    global _nullPicture
+    if _nullPicture is None:
+        _nullPicture = picturemodule.Picture(1, 1)
+    return _nullPicture
+
+_NULL_BACKEND_FUNCTIONS = (
+    '_pixel', 'point', 'line', 'circle', 'filledCircle', 'rectangle',
+    'filledRectangle', 'square', 'filledSquare', 'polygon',
+    'filledPolygon', 'text', 'boldText', 'picture', 'renderPicture',
+    'snapshot', 'restoreRegion', 'invalidate', 'lines', 'squares',
+    'filledSquares', 'texts', 'pictures', 'restoreRegions',
+    'invalidateRegions', 'clear', 'save',
+    '_show', '_checkForEvents')
+
+_drawingFunctions = {name: globals()[name] for name in _NULL_BACKEND_FUNCTIONS}
+
+def _installBackend():
+    """
+    Bind the module functions that depend on the rendering backend.
+    Rebinding them (instead of testing the backend in each of them)
+    keeps the cost of the WINDOW backend unchanged.
+    """
+    for name in _NULL_BACKEND_FUNCTIONS:
+        if _backend == NULL:
+            globals()[name] = _nullSnapshot if name == 'snapshot' else _noOp
+        else:
+            globals()[name] = _drawingFunctions[name]
+
+#-----------------------------------------------------------------------
+
+# Initialize the backend, the x scale, the y scale, the pen radius, and
+# the pen color.
+
+_installBackend()
 
 setXscale()
 setYscale()
 setPenRadius()
+setPenColor()
 pygame.font.init()
 
 #-----------------------------------------------------------------------
@@ -903,6 +1744,10 @@ def _regressionTest():
     text(.2, .4, 'hello, world')
     show(0.0)
 
+    # Time the drawing primitives with and without the color cache.
+    _benchmark(2000)
+    show(0.0)
+
     #import picture as p
     #pic = p.Picture('saveIcon.png')
     #picture(pic, .5, .85)
@@ -923,14 +1768,71 @@ def _regressionTest():
 
 #-----------------------------------------------------------------------
 
+def _benchmark(n=20000):
+    """
+    Print the time per call (in microseconds) of some drawing
+    primitives drawn n times with a fixed pen color (the best of 5
+    runs), converting the pen color (and the colors given) on each
+    call, as the primitives did before the color cache was added, and
+    reading the cached conversions, as they do now. Restore the canvas
+    afterwards.
+    """
+    global _pygameColor
+    global _penPygameColor
+    _makeSureWindowCreated()
+    saved = _surface.copy()
+    colors = [WHITE, BLACK, RED, GREEN, BLUE, CYAN, MAGENTA, YELLOW,
+              DARK_RED, DARK_GREEN, DARK_BLUE, GRAY, ORANGE, VIOLET,
+              PINK, BOOK_BLUE]
+    xs = [0.1 + 0.05 * i for i in range(len(colors))]
+    primitives = [
+        ('filledSquare', lambda: filledSquare(0.5, 0.5, 0.01)),
+        ('filledRectangle', lambda: filledRectangle(0.5, 0.5, 0.02, 0.01)),
+        ('square', lambda: square(0.5, 0.5, 0.01)),
+        ('line', lambda: line(0.1, 0.1, 0.9, 0.9)),
+        ('filledSquares', lambda: filledSquares(xs, 0.5, 0.01, colors))]
+    cachedConversion = _pygameColor
+    setPenColor(BOOK_BLUE)
+    print('%-16s %12s %12s' % ('primitive', 'uncached', 'cached'))
+    try:
+        for name, draw in primitives:
+            # The best of 5 alternating runs of each path is printed.
+            uncached = cached = float('inf')
+            for run in range(5):
+                # Before the cache, each primitive converted the pen
+                # color.
+                _pygameColor = _convertColor
+                start = time.perf_counter()
+                for i in range(n):
+                    _penPygameColor = _convertColor(_penColor)
+                    draw()
+                uncached = min(uncached, time.perf_counter() - start)
+                _pygameColor = cachedConversion
+                _penPygameColor = _pygameColor(_penColor)
+                start = time.perf_counter()
+                for i in range(n):
+                    draw()
+                cached = min(cached, time.perf_counter() - start)
+            print('%-16s %12.2f %12.2f' % (name, uncached / n * 1e6,
+                                           cached / n * 1e6))
+    finally:
+        _pygameColor = cachedConversion
+        setPenColor()
+        _surface.blit(saved, (0, 0))
+
 def _main():
     """
-    Dispatch to a function that does regression testing, or to a
-    dialog-box-handling function.
+    Dispatch to a function that does regression testing, to a
+    benchmark, or to a dialog-box-handling function.
     """
     import sys
     if len(sys.argv) == 1:
         _regressionTest()
+    elif sys.argv[1] == 'benchmark':
+        if _backend == WINDOW:
+            setBackend(OFFSCREEN)
+        setCanvasSize(512, 512)
+        _benchmark()
     elif sys.argv[1] == 'getFileName':
         _getFileName()
     elif sys.argv[1] == 'confirmFileSave':
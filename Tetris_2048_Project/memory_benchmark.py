@@ -0,0 +1,91 @@
+import os  # used for selecting the drawing backend
+import struct  # used for the size of a reference
+import sys  # used for reading the command line arguments
+import tracemalloc  # used for measuring the allocated memory
+
+# the benchmark needs no display, the tiles and the grid are never drawn
+os.environ.setdefault("STDDRAW_BACKEND", "null")
+
+import numpy as np  # used for filling the game grid with random tiles
+from lib.color import Color  # used for measuring the memory of the colors
+from point import Point  # used for measuring the memory of the points
+from tile import Tile  # used for measuring the memory of the tiles
+from game_grid import GameGrid  # used for measuring the memory of locked tiles
+
+
+# The classes that model Color, Point and Tile objects as they were stored
+# before (with a per-object dictionary and separate colors for each tile)
+class DictColor(Color):
+   pass
+
+class DictPoint(Point):
+   pass
+
+class DictTile(Tile):
+   # A constructor that creates a tile with its own copies of the colors
+   def __init__(self):
+      Tile.__init__(self)
+      c = self.background_color
+      self.background_color = DictColor(c.getRed(), c.getGreen(), c.getBlue())
+      self.foreground_color = DictColor(159, 149, 138)
+      self.box_color = DictColor(143, 134, 125)
+
+
+# A function that returns the average number of bytes allocated for each of
+# the n objects created by calling a given function
+def bytes_per_object(create, n):
+   tracemalloc.start()
+   before = tracemalloc.get_traced_memory()[0]
+   objects = [create() for _ in range(n)]
+   after = tracemalloc.get_traced_memory()[0]
+   tracemalloc.stop()
+   # exclude the list that keeps the objects alive
+   return (after - before - sys.getsizeof(objects)) / n
+
+
+# A function that returns the number of bytes allocated for a full game grid
+# with the given size
+def bytes_per_grid(grid_h, grid_w):
+   tracemalloc.start()
+   before = tracemalloc.get_traced_memory()[0]
+   grid = GameGrid(grid_h, grid_w, 5)
+   grid.cells[:] = np.random.randint(1, 12, size=(grid_h, grid_w))
+   after = tracemalloc.get_traced_memory()[0]
+   tracemalloc.stop()
+   return after - before
+
+# A function that returns the number of bytes allocated for each locked tile
+# on a full game grid with the given size (the memory that a grid with twice
+# the rows takes in addition, so the fixed cost of a grid is excluded)
+def bytes_per_locked_tile(grid_h, grid_w):
+   bytes_per_grid(grid_h, grid_w)  # warm up the caches used by a grid
+   extra = bytes_per_grid(2 * grid_h, grid_w) - bytes_per_grid(grid_h, grid_w)
+   return extra / (grid_h * grid_w)
+
+
+# A function that returns the number of bytes each locked tile took before
+# (a tile object with its own colors referred by a cell of a tile matrix)
+def bytes_per_locked_tile_before(n):
+   return bytes_per_object(DictTile, n) + struct.calcsize("P")
+
+
+# The main function that runs the benchmark and prints its report
+def main(n=10000, grid_h=20, grid_w=12):
+   print("objects:", n, "grid:", grid_h, "x", grid_w)
+   print("%-12s %10s %10s" % ("", "before", "after"))
+   rows = [
+      ("Color", bytes_per_object(lambda: DictColor(1, 2, 3), n),
+                bytes_per_object(lambda: Color(1, 2, 3), n)),
+      ("Point", bytes_per_object(DictPoint, n), bytes_per_object(Point, n)),
+      ("Tile", bytes_per_object(DictTile, n), bytes_per_object(Tile, n)),
+      ("locked tile", bytes_per_locked_tile_before(n),
+                      bytes_per_locked_tile(grid_h, grid_w)),
+   ]
+   for name, before, after in rows:
+      print("%-12s %10.1f %10.1f" % (name, before, after))
+
+
+# start the benchmark when this module is run (the number of objects and the
+# size of the game grid can be given as command line arguments)
+if __name__ == '__main__':
+   main(*[int(arg) for arg in sys.argv[1:]])
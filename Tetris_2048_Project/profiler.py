@@ -0,0 +1,229 @@
+import atexit  # used for saving the measured times when the program exits
+import csv  # used for saving the measured times as CSV
+import json  # used for saving the measured times as JSON
+import os  # used for reading the environment variables
+import time  # used for measuring the time of the phases
+from array import array  # used for storing the measured times compactly
+import numpy as np  # used for placing the lines of the overlay
+import lib.stddraw as stddraw  # used for drawing the overlay
+from lib.color import getColor  # used for coloring the overlay
+from game_grid import GameGrid  # the class whose methods are timed
+from game_session import GameSession  # the class whose methods are timed
+from game_clock import GameClock  # the class whose methods are timed
+from tetromino import Tetromino  # the class whose methods are timed
+
+# the phases of an iteration of the game loop that are timed, each phase
+# excludes the time of the phases nested in it (e.g., the time of "input"
+# excludes moving the tetromino with the keys typed, which is "move")
+PHASES = ("input", "move", "gravity", "lock", "merge", "clear", "draw",
+          "present", "overlay", "sleep", "frame")
+# the percentiles reported for the time of each phase
+PERCENTILES = (50, 95, 99)
+# the number of the last measured times kept for each phase
+DEFAULT_CAPACITY = 4096
+# the time in seconds between two updates of the overlay
+OVERLAY_INTERVAL = 0.25
+
+# A class for keeping the last values added to it (at most capacity values)
+class RingBuffer:
+   # A constructor that creates an empty ring buffer with the given capacity
+   def __init__(self, capacity):
+      self.values = array("d", bytes(8 * capacity))
+      self.capacity = capacity
+      self.count = 0  # the number of all the values added so far
+
+   # A method for adding a value, replacing the oldest value when it is full
+   def add(self, value):
+      self.values[self.count % self.capacity] = value
+      self.count += 1
+
+   # A method that returns the values kept in the buffer (oldest first)
+   def get_values(self):
+      if self.count <= self.capacity:
+         return self.values[:self.count].tolist()
+      start = self.count % self.capacity
+      return (self.values[start:] + self.values[:start]).tolist()
+
+# A class for measuring the time spent in each phase of the game loop, the
+# timed methods and functions are replaced with timing wrappers only when the
+# profiler is installed, so the game runs at full speed when it is not
+class FrameProfiler:
+   # A constructor that creates a profiler keeping the given number of times
+   # for each phase and showing them in the right panel when overlay is True
+   def __init__(self, capacity=DEFAULT_CAPACITY, overlay=False):
+      self.buffers = {phase: RingBuffer(capacity) for phase in PHASES}
+      # the time spent in each phase in the current iteration of the game loop
+      self.frame_times = {}
+      # the phases being timed (the innermost last) as [phase, start] pairs
+      self.stack = []
+      self.frame_start = time.perf_counter()
+      self.overlay = overlay
+      self.next_overlay = 0
+      # the replaced methods and functions as (owner, name, original) tuples
+      self.wrapped = []
+
+   # A method for starting to time the given phase (pausing the timing of the
+   # phase it is nested in)
+   def push(self, phase):
+      now = time.perf_counter()
+      if self.stack:
+         outer = self.stack[-1]
+         self.frame_times[outer[0]] = self.frame_times.get(outer[0], 0) + now - outer[1]
+      self.stack.append([phase, now])
+
+   # A method for stopping the timing of the innermost phase (resuming the
+   # timing of the phase it is nested in)
+   def pop(self):
+      now = time.perf_counter()
+      phase, start = self.stack.pop()
+      self.frame_times[phase] = self.frame_times.get(phase, 0) + now - start
+      if self.stack:
+         self.stack[-1][1] = now
+
+   # A method for ending an iteration of the game loop, adding the time of each
+   # phase that was run in it and the time of the whole iteration
+   def end_frame(self):
+      now = time.perf_counter()
+      for phase, elapsed in self.frame_times.items():
+         self.buffers[phase].add(elapsed)
+      self.buffers["frame"].add(now - self.frame_start)
+      self.frame_times.clear()
+      self.frame_start = now
+
+   # A method that returns the number of the measured times, and their mean and
+   # percentiles in ms for each phase that was measured
+   def get_stats(self):
+      stats = {}
+      for phase, buffer in self.buffers.items():
+         values = sorted(buffer.get_values())
+         if not values:
+            continue
+         phase_stats = {"count": buffer.count,
+                        "mean_ms": sum(values) / len(values) * 1000}
+         for p in PERCENTILES:
+            index = min(len(values) - 1, int(len(values) * p / 100))
+            phase_stats["p%d_ms" % p] = values[index] * 1000
+         stats[phase] = phase_stats
+      return stats
+
+   # A method for replacing the method or function with the given name of the
+   # given class or module with a wrapper that times it as the given phase
+   def wrap(self, owner, name, phase):
+      original = getattr(owner, name)
+      push, pop = self.push, self.pop
+      def timed(*args, **kwargs):
+         push(phase)
+         try:
+            return original(*args, **kwargs)
+         finally:
+            pop()
+      setattr(owner, name, timed)
+      self.wrapped.append((owner, name, original))
+      return original
+
+   # A method for replacing the methods and functions run in the game loop with
+   # timing wrappers
+   def install(self):
+      self.wrap(stddraw, "pollEvents", "input")
+      self.wrap(stddraw, "drainKeyEvents", "input")
+      self.wrap(GameSession, "apply_key", "input")
+      self.wrap(Tetromino, "move", "move")
+      self.wrap(Tetromino, "rotate_clockwise", "move")
+      self.wrap(GameSession, "gravity_step", "gravity")
+      self.wrap(GameGrid, "lock_cells", "lock")
+      self.wrap(GameGrid, "merge_tiles", "merge")
+      self.wrap(GameGrid, "clear_full_lines", "clear")
+      self.wrap(stddraw, "showInvalidated", "present")
+      # the overlay is drawn after the game grid is displayed
+      profiler = self
+      display = GameGrid.display
+      def display_with_overlay(grid, tetro):
+         display(grid, tetro)
+         if profiler.overlay:
+            profiler.push("overlay")
+            try:
+               profiler.draw_overlay(grid)
+            finally:
+               profiler.pop()
+      GameGrid.display = display_with_overlay
+      self.wrapped.append((GameGrid, "display", display))
+      self.wrap(GameGrid, "display", "draw")
+      # waiting for the next step is the last phase of an iteration
+      self.wrap(GameClock, "wait", "sleep")
+      timed_wait = GameClock.wait
+      def wait_and_end_frame(clock):
+         timed_wait(clock)
+         profiler.end_frame()
+      GameClock.wait = wait_and_end_frame
+      self.wrapped.append((GameClock, "wait", timed_wait))
+
+   # A method for restoring the methods and functions replaced by install
+   def uninstall(self):
+      while self.wrapped:
+         owner, name, original = self.wrapped.pop()
+         setattr(owner, name, original)
+
+   # A method for drawing the percentiles of the phase times on the right panel
+   # of the given game grid (over the instructions), at most once in every
+   # OVERLAY_INTERVAL seconds
+   def draw_overlay(self, grid):
+      now = time.perf_counter()
+      if now < self.next_overlay:
+         return
+      self.next_overlay = now + OVERLAY_INTERVAL
+      # (the instructions are wider than the panel, so the box starts right
+      # after the boundary of the game grid)
+      x, y = grid.grid_width - 0.35, grid.grid_height - 13.6
+      w, h = grid.right_panel_width - 0.15, 8.4
+      stddraw.setPenColor(grid.empty_cell_color)
+      stddraw.filledRectangle(x, y, w, h)
+      # redraw the left side of the right panel covered by the box
+      stddraw.setPenColor(grid.line_color)
+      stddraw.setPenRadius(grid.line_thickness)
+      stddraw.line(grid.grid_width, y, grid.grid_width, y + h)
+      stddraw.setPenRadius()
+      stddraw.invalidate(x, y, w, h)
+      stats = self.get_stats()
+      lines = ["phase  p50  p95  p99 ms"]
+      for phase in PHASES:
+         if phase in stats:
+            s = stats[phase]
+            lines.append("%-7s %5.2f %5.2f %5.2f" % (phase, s["p50_ms"], s["p95_ms"], s["p99_ms"]))
+      stddraw.setPenColor(getColor(119, 110, 101))
+      stddraw.setFontFamily("Courier")
+      stddraw.setFontSize(15)
+      stddraw.texts(x + w / 2, y + h - 0.4 - 0.6 * np.arange(len(lines)), lines)
+      stddraw.showInvalidated()
+
+   # A method for saving the measured times to the file with the given name, as
+   # JSON (the statistics and the times kept for each phase) when its name ends
+   # with .json, or as CSV (the statistics of each phase) otherwise
+   def dump(self, file_name):
+      stats = self.get_stats()
+      if file_name.lower().endswith(".json"):
+         samples = {phase: [t * 1000 for t in self.buffers[phase].get_values()]
+                    for phase in stats}
+         with open(file_name, "w") as f:
+            json.dump({"stats": stats, "samples_ms": samples}, f)
+         return
+      columns = ["count", "mean_ms"] + ["p%d_ms" % p for p in PERCENTILES]
+      with open(file_name, "w", newline="") as f:
+         writer = csv.writer(f)
+         writer.writerow(["phase"] + columns)
+         for phase, phase_stats in stats.items():
+            writer.writerow([phase] + [phase_stats[c] for c in columns])
+
+# A function that installs a profiler when the TETRIS_PROFILE environment
+# variable is set (to the name of the .csv or .json file the times are saved to
+# when the program exits) or TETRIS_PROFILE_OVERLAY is set (to show the times in
+# the right panel), and returns the profiler (None when it is not installed)
+def install_from_environment():
+   file_name = os.environ.get("TETRIS_PROFILE")
+   overlay = bool(os.environ.get("TETRIS_PROFILE_OVERLAY"))
+   if not file_name and not overlay:
+      return None
+   profiler = FrameProfiler(overlay=overlay)
+   profiler.install()
+   if file_name:
+      atexit.register(profiler.dump, file_name)
+   return profiler
@@ -0,0 +1,152 @@
+import struct  # used for packing the values in the binary replay logs
+import sys  # used for reading the command line arguments
+import time  # used for measuring the playback time
+from game_session import GameSession  # the class for modeling a game
+
+# the first bytes of each replay log and the version of its format
+MAGIC = b"T2048R"
+VERSION = 1
+# the header of a replay log: the version, the seed of the game, the size of
+# the game grid, the width of the right panel and the speed of the game
+HEADER = struct.Struct("<BIHHHH")
+
+# A function for appending a non-negative integer to a bytearray as a variable
+# length integer (7 bits per byte, the high bit is set on all bytes but the last)
+def write_varint(out, value):
+   while value >= 0x80:
+      out.append((value & 0x7F) | 0x80)
+      value >>= 7
+   out.append(value)
+
+# A function that reads a variable length integer from data at the given
+# position and returns the integer and the position after it
+def read_varint(data, pos):
+   value, shift = 0, 0
+   while True:
+      byte = data[pos]
+      pos += 1
+      value |= (byte & 0x7F) << shift
+      if byte < 0x80:
+         return value, pos
+      shift += 7
+
+# A class for modeling the replay log of a game: the seed and the settings of
+# the game, its inputs as (tick, key) pairs, and the number of ticks, the final
+# score and the hash of the game grid at its end
+class ReplayLog:
+   # A constructor that creates a replay log with the given values
+   def __init__(self, seed, grid_h, grid_w, right_panel_width, speed,
+                inputs=(), ticks=0, score=0, board_hash=bytes(16)):
+      self.seed = seed
+      self.grid_height, self.grid_width = grid_h, grid_w
+      self.right_panel_width = right_panel_width
+      self.speed = speed
+      self.inputs = list(inputs)
+      self.ticks = ticks
+      self.score = score
+      self.board_hash = board_hash
+
+   # A method that returns the replay log of the given game (as played so far)
+   @staticmethod
+   def from_session(session):
+      grid = session.grid
+      return ReplayLog(session.seed, grid.grid_height, grid.grid_width,
+                       grid.right_panel_width, grid.speed, session.inputs,
+                       session.tick, grid.score, session.board_hash())
+
+   # A method that returns this replay log in its compact binary format: the
+   # header, the number of inputs, each input as the number of ticks since the
+   # previous input and the index of its key, and the number of ticks, the
+   # score and the 16 byte hash of the game grid at the end
+   def to_bytes(self):
+      out = bytearray(MAGIC)
+      out += HEADER.pack(VERSION, self.seed, self.grid_height, self.grid_width,
+                         self.right_panel_width, self.speed)
+      write_varint(out, len(self.inputs))
+      previous_tick = 0
+      for tick, key in self.inputs:
+         write_varint(out, tick - previous_tick)
+         out.append(GameSession.keys.index(key))
+         previous_tick = tick
+      write_varint(out, self.ticks)
+      write_varint(out, self.score)
+      out += self.board_hash
+      return bytes(out)
+
+   # A method that returns the replay log stored in the given bytes
+   @staticmethod
+   def from_bytes(data):
+      if data[:len(MAGIC)] != MAGIC:
+         raise ValueError("not a replay log")
+      pos = len(MAGIC)
+      version, seed, grid_h, grid_w, right_panel_width, speed = \
+         HEADER.unpack_from(data, pos)
+      if version != VERSION:
+         raise ValueError("unsupported replay log version: " + str(version))
+      pos += HEADER.size
+      n_inputs, pos = read_varint(data, pos)
+      inputs, tick = [], 0
+      for _ in range(n_inputs):
+         delta, pos = read_varint(data, pos)
+         tick += delta
+         inputs.append((tick, GameSession.keys[data[pos]]))
+         pos += 1
+      ticks, pos = read_varint(data, pos)
+      score, pos = read_varint(data, pos)
+      board_hash = bytes(data[pos:pos + 16])
+      return ReplayLog(seed, grid_h, grid_w, right_panel_width, speed,
+                       inputs, ticks, score, board_hash)
+
+   # A method for saving this replay log to the file with the given name
+   def save(self, file_name):
+      with open(file_name, "wb") as f:
+         f.write(self.to_bytes())
+
+   # A method that returns the replay log read from the file with the given name
+   @staticmethod
+   def load(file_name):
+      with open(file_name, "rb") as f:
+         return ReplayLog.from_bytes(f.read())
+
+# A function that replays the game in the given replay log without displaying
+# it (as fast as possible) and returns the replayed game
+def play(log):
+   session = GameSession(log.grid_height, log.grid_width, log.right_panel_width,
+                         log.speed, log.seed)
+   inputs, i = log.inputs, 0
+   for tick in range(log.ticks):
+      # apply the keys of this tick before its gravity step
+      while i < len(inputs) and inputs[i][0] == tick:
+         session.apply_key(inputs[i][1])
+         i += 1
+      if session.gravity_step():
+         return session
+   # apply the keys typed after the last gravity step
+   for _, key in inputs[i:]:
+      session.apply_key(key)
+   return session
+
+# A function that replays the game in the given replay log and returns whether
+# the replayed game ends with the score and the game grid in the log, and the
+# replayed game
+def verify(log):
+   session = play(log)
+   matches = session.tick == log.ticks and session.grid.score == log.score \
+      and session.board_hash() == log.board_hash
+   return matches, session
+
+# replay the games in the replay log files given as command line arguments and
+# report whether each of them is reproduced (the exit status is 1 if any game
+# is not reproduced)
+if __name__ == '__main__':
+   all_match = True
+   for file_name in sys.argv[1:]:
+      log = ReplayLog.load(file_name)
+      start_time = time.perf_counter()
+      matches, session = verify(log)
+      elapsed = time.perf_counter() - start_time
+      all_match = all_match and matches
+      print("%s: %s, score %d (logged %d), %d ticks in %.3f s (%.0f ticks/s)" % (
+         file_name, "OK" if matches else "MISMATCH", session.grid.score,
+         log.score, session.tick, elapsed, session.tick / max(elapsed, 1e-9)))
+   sys.exit(0 if all_match else 1)
@@ -0,0 +1,393 @@
+import lib.stddraw as stddraw  # for drawing the scenes and getting user input
+import lib.picture as picture  # used for loading the image on the game menus
+from lib.color import getColor  # used for coloring the game menus
+import os  # the os module is used for file and directory operations
+from game_session import GameSession  # the class for modeling a game
+from game_clock import GameClock  # the class for scheduling the game loop
+from replay import ReplayLog  # used for saving the replay logs of the games
+
+# the interval between two rendered frames in ms (limits the frame rate to 60)
+RENDER_INTERVAL = 1000 / 60
+# the interval between two checks for the user's input in ms
+INPUT_POLL_INTERVAL = 2
+# the time in ms a moving key is held before it repeats, and the time in ms
+# between its repeats
+KEY_REPEAT_DELAY = 170
+KEY_REPEAT_INTERVAL = 50
+
+# the image file displayed on the game menus
+MENU_IMAGE_FILE = os.path.join(os.path.dirname(os.path.realpath(__file__)),
+                               "images", "menu_image.png")
+# the name of the file the replay log of each game is saved to when it is over
+# (no replay logs are saved when it is not set, {seed} is replaced with the
+# seed of the game and any other braces are kept)
+REPLAY_FILE = os.environ.get("TETRIS_REPLAY")
+
+# A function for saving the replay log of the given game to the file with the
+# given name (creating its directory when needed), a failure is reported
+# without ending the program
+def save_replay(session, file_name):
+   try:
+      os.makedirs(os.path.dirname(file_name) or ".", exist_ok=True)
+      ReplayLog.from_session(session).save(file_name)
+   except OSError as error:
+      print("The replay log could not be saved to %s: %s" % (file_name, error))
+
+# A function that shows the menu drawn on the canvas and waits until the mouse
+# is left-clicked, and returns the coordinates of the location at which the
+# mouse has been left-clicked (the menu is shown again only when the window is
+# exposed, and the CPU is not used while waiting)
+def wait_for_click():
+   stddraw.show(0)
+   while not stddraw.mousePressed():
+      stddraw.waitForEvent()
+      if stddraw.isExposed():
+         stddraw.show(0)
+   return stddraw.mouseX(), stddraw.mouseY()
+
+# A class for running the scenes of the program (the menus and the game) one
+# after another in a single loop, each scene runs until it returns the next
+# scene (or None to end the program), so going back to a menu does not keep the
+# previous scenes and their games
+class SceneManager:
+   # A constructor that creates a scene manager for a game grid and a right
+   # panel with the given dimensions
+   def __init__(self, grid_h, grid_w, right_panel_width):
+      self.grid_height, self.grid_width = grid_h, grid_w
+      self.right_panel_width = right_panel_width
+      # the width of the drawing canvas
+      self.canvas_width = grid_w + right_panel_width
+      # the pictures of the static parts of the scenes, keyed by their names
+      self.backgrounds = {}
+
+   # A method that returns the picture with the given name, drawing it by
+   # calling the given function (which returns the picture) only the first time
+   # it is needed
+   def get_background(self, name, draw):
+      if name not in self.backgrounds:
+         self.backgrounds[name] = draw()
+      return self.backgrounds[name]
+
+   # A method for running the scenes starting from the given scene
+   def run(self, scene):
+      while scene is not None:
+         scene = scene.run()
+
+# A class for the simple menu displayed before starting the game
+class MenuScene:
+   # the colors used for the menu
+   background_color = getColor(42, 69, 99)
+   button_color = getColor(238, 228, 218)
+   text_color = getColor(31, 160, 239)
+
+   # A constructor that creates the menu scene run by the given scene manager
+   def __init__(self, manager):
+      self.manager = manager
+      # the coordinates to display the image centered horizontally
+      self.img_center_x = (manager.canvas_width - 1) / 2
+      self.img_center_y = manager.grid_height - 7
+      # the dimensions for the start game button
+      self.button_w, self.button_h = manager.canvas_width - 1.5, 2
+      # the coordinates of the bottom left corner for the start game button
+      self.button_blc_x = self.img_center_x - self.button_w / 2
+      self.button_blc_y = 4
+
+   # A method for drawing the menu and returning it as a picture
+   def draw(self):
+      # clear the background drawing canvas to background_color
+      stddraw.clear(MenuScene.background_color)
+      # the image is modeled by using the Picture class (read from the image file
+      # only once and then kept in the cache of the picture module)
+      image_to_display = picture.load(MENU_IMAGE_FILE)
+      # add the image to the drawing canvas
+      stddraw.picture(image_to_display, self.img_center_x, self.img_center_y)
+      # add the start game button as a filled rectangle
+      stddraw.setPenColor(MenuScene.button_color)
+      stddraw.filledRectangle(self.button_blc_x, self.button_blc_y, self.button_w, self.button_h)
+      # add the text on the start game button
+      stddraw.setFontFamily("Arial")
+      stddraw.setFontSize(25)
+      stddraw.setPenColor(MenuScene.text_color)
+      text_to_display = "Click Here to Start the Game"
+      stddraw.text(self.img_center_x, 5, text_to_display)
+      return stddraw.snapshot()
+
+   # A method for running the menu until the start game button is clicked
+   def run(self):
+      stddraw.picture(self.manager.get_background("menu", self.draw))
+      # a headless canvas cannot be clicked, so start the game right away
+      if stddraw.isHeadless():
+         return SpeedScene(self.manager)
+      # the user interaction loop for the simple menu
+      while True:
+         # display the menu and wait until the mouse is left-clicked, and get the
+         # coordinates of the location at which the mouse has been left-clicked
+         mouse_x, mouse_y = wait_for_click()
+         # check if these coordinates are inside the start game button
+         if mouse_x >= self.button_blc_x and mouse_x <= self.button_blc_x + self.button_w:
+            if mouse_y >= self.button_blc_y and mouse_y <= self.button_blc_y + self.button_h:
+               return SpeedScene(self.manager)  # start the game
+
+# A class for the simple menu for game speed selection
+class SpeedScene:
+   # the colors used for the menu
+   background_color = getColor(187, 182, 165)
+   button_color = getColor(238, 228, 218)
+   text_color = getColor(160, 109, 130)
+   # the speeds (the time between two automatic moves down in ms) that can be
+   # selected, and the y coordinates of the bottom of their buttons
+   speeds = (("Slow", 275, 1), ("Medium", 175, 4), ("Fast", 100, 7))
+   # the speed used when the menu cannot be clicked (Medium)
+   default_speed = 175
+
+   # A constructor that creates the speed menu run by the given scene manager
+   def __init__(self, manager):
+      self.manager = manager
+      # the coordinates to display the image centered horizontally
+      self.img_center_x = (manager.canvas_width - 1) / 2
+      self.img_center_y = manager.grid_height - 7
+      # Creating general button dimensions
+      self.button_w, self.button_h = manager.canvas_width - 1.5, 2
+      # Creating general button horizontal position
+      self.button_blc_x = self.img_center_x - self.button_w / 2
+
+   # A method for drawing the menu and returning it as a picture
+   def draw(self):
+      # Adjust colors for speed menu screen
+      stddraw.clear(SpeedScene.background_color)
+      # Showing game title image
+      image_to_display = picture.load(MENU_IMAGE_FILE)
+      stddraw.picture(image_to_display, self.img_center_x, self.img_center_y)
+      # a button with its text for each speed
+      for text_to_display, speed, button_blc_y in SpeedScene.speeds:
+         stddraw.setPenColor(SpeedScene.button_color)
+         stddraw.filledRectangle(self.button_blc_x, button_blc_y, self.button_w, self.button_h)
+         stddraw.setFontFamily("Arial")
+         stddraw.setFontSize(25)
+         stddraw.setPenColor(SpeedScene.text_color)
+         stddraw.text(self.img_center_x, button_blc_y + 1, text_to_display)
+      return stddraw.snapshot()
+
+   # A method for running the menu until a speed is selected, and starting a
+   # new game with the selected speed
+   def run(self):
+      stddraw.picture(self.manager.get_background("speed", self.draw))
+      # a headless canvas cannot be clicked, so use the medium speed
+      if stddraw.isHeadless():
+         return self.start_game(SpeedScene.default_speed)
+      while True:
+         # display the menu and wait until the mouse is left-clicked on it
+         mouse_x, mouse_y = wait_for_click()
+         # Check if mouse click is on the button of a speed
+         for text_to_display, speed, button_blc_y in SpeedScene.speeds:
+            if self.button_blc_x <= mouse_x <= self.button_blc_x + self.button_w and \
+                  button_blc_y <= mouse_y <= button_blc_y + self.button_h:
+               return self.start_game(speed)
+
+   # A method that returns the scene of a new game with the given speed
+   def start_game(self, speed):
+      manager = self.manager
+      session = GameSession(manager.grid_height, manager.grid_width,
+                            manager.right_panel_width, speed)
+      return PlayingScene(manager, session)
+
+# A class for the scene where the game is played
+class PlayingScene:
+   # A constructor that creates the scene for playing the given game (a new or
+   # a paused game) run by the given scene manager
+   def __init__(self, manager, session):
+      self.manager = manager
+      self.session = session
+
+   # A method for running the game until it is paused or over
+   def run(self):
+      session, grid = self.session, self.session.grid
+      # the static parts of the display of the game are the same for all games
+      grid.background = self.manager.get_background("game", grid.draw_background)
+      # the game is drawn over the previous scene, redraw all of it
+      grid.invalidate()
+      # repeat the moving keys while they are held down
+      stddraw.setKeyRepeat(KEY_REPEAT_DELAY, KEY_REPEAT_INTERVAL, ("left", "right", "down"))
+      # the keys typed in the menus are not applied to the game
+      stddraw.clearKeyEvents()
+      # the clock that schedules gravity (automatic moves down at the selected
+      # speed), rendering and input polling separately, a headless game does not
+      # wait and makes one gravity step in each iteration (the time spent in a
+      # menu does not move the tetromino)
+      clock = GameClock(grid.speed, RENDER_INTERVAL, INPUT_POLL_INTERVAL,
+                        realtime=not stddraw.isHeadless())
+      try:
+         return self.play(clock)
+      finally:
+         # the keys held in the menus are not repeated
+         stddraw.setKeyRepeat()
+
+   # A method for running the main game loop with the given clock until the
+   # game is paused or over, and returning the next scene
+   def play(self, clock):
+      session, grid = self.session, self.session.grid
+      # the main game loop
+      while True:
+         # check for any user interaction via the keyboard
+         stddraw.pollEvents()
+         # apply all the keys pressed (or repeated while held) since the last check
+         for event_time, event_type, key_typed in stddraw.drainKeyEvents():
+            if event_type == stddraw.KEY_RELEASED:
+               continue
+            # the p key opens the pause menu
+            if key_typed == "p":
+               return PauseScene(self.manager, session)
+            session.apply_key(key_typed)
+         # move the active tetromino down by one at each gravity step (auto fall)
+         for _ in range(clock.gravity_steps()):
+            # end the game when it is over
+            if session.gravity_step():
+               if REPLAY_FILE:
+                  save_replay(session, REPLAY_FILE.replace("{seed}", str(session.seed)))
+               return GameOverScene(self.manager, grid.win, grid.score)
+         # display the game grid with the current tetromino when a frame is due
+         if clock.render_due():
+            session.display()
+         # wait until the next input poll, gravity step or frame
+         clock.wait()
+
+# A class for the simple pause menu
+class PauseScene:
+   # the colors used for the menu
+   background_color = getColor(42, 69, 99)
+   button_color = getColor(25, 255, 228)
+   text_color = getColor(31, 160, 239)
+
+   # A constructor that creates the pause menu for the given game run by the
+   # given scene manager
+   def __init__(self, manager, session):
+      self.manager = manager
+      self.session = session
+      # the dimensions for the continue game button
+      self.button_w, self.button_h = manager.grid_width - 1.5, 2
+      # the coordinates of the bottom left corner for the continue game button
+      self.button_blc_x, self.button_blc_y = 5 - self.button_w / 2, 4
+
+   # A method for drawing the menu and returning it as a picture
+   def draw(self):
+      button_blc_x, button_blc_y = self.button_blc_x, self.button_blc_y
+      # clear the background drawing canvas to background_color
+      stddraw.clear(PauseScene.background_color)
+      # add the continue game button as a filled rectangle
+      stddraw.setPenColor(PauseScene.button_color)
+      stddraw.filledRectangle(button_blc_x + 3, button_blc_y, self.button_w, self.button_h)
+      # add the text on the continue game button
+      stddraw.setFontFamily("Arial")
+      stddraw.setFontSize(25)
+      stddraw.setPenColor(PauseScene.text_color)
+      text_to_display = "Continue"
+      stddraw.text(8, 5, text_to_display)
+      # add the back to menu game button as a filled rectangle
+      stddraw.setPenColor(PauseScene.button_color)
+      stddraw.filledRectangle(button_blc_x + 3, button_blc_y + 3, self.button_w, self.button_h)
+      # add the text on the back to menu game button
+      stddraw.setPenColor(PauseScene.text_color)
+      text_to_display = "Back to Main Menu"
+      stddraw.text(8, 8, text_to_display)
+      # add the pause text
+      stddraw.setFontSize(45)
+      text_to_display = "Game Paused"
+      stddraw.text(8, 15, text_to_display)
+      return stddraw.snapshot()
+
+   # A method for running the menu until the game is continued or left
+   def run(self):
+      stddraw.picture(self.manager.get_background("pause", self.draw))
+      # a headless canvas cannot be clicked, so continue the game right away
+      if stddraw.isHeadless():
+         return PlayingScene(self.manager, self.session)
+      button_blc_x, button_blc_y = self.button_blc_x, self.button_blc_y
+      button_w, button_h = self.button_w, self.button_h
+      while True:
+         # display the menu and wait until the mouse is left-clicked, and get the
+         # coordinates of the location at which the mouse has been left-clicked
+         mouse_x, mouse_y = wait_for_click()
+         # check if these coordinates are inside the button (Continue)
+         if mouse_x >= button_blc_x + 3 and mouse_x <= button_blc_x + button_w + 3:
+            if mouse_y >= button_blc_y and mouse_y <= button_blc_y + button_h:
+               return PlayingScene(self.manager, self.session)
+         # check if these coordinates are inside the button (Back to main menu),
+         # the paused game is left (and released)
+         if mouse_x >= button_blc_x + 3 and mouse_x <= button_blc_x + button_w + 3:
+            if mouse_y >= button_blc_y + 3 and mouse_y <= button_blc_y + 3 + button_h:
+               return MenuScene(self.manager)
+
+# A class for the simple game over menu with different messages depending on
+# win/lose
+class GameOverScene:
+   # the colors used for the menu
+   background_color = getColor(42, 69, 99)
+   button_color = getColor(25, 255, 228)
+   text_color = getColor(31, 160, 239)
+
+   # A constructor that creates the game over menu for a game that is won or
+   # lost with the given final score, run by the given scene manager (the game
+   # itself is not kept)
+   def __init__(self, manager, win, final_score):
+      self.manager = manager
+      # show victory message if game is won and lose message if game is lost
+      self.message = "You won the game!" if win else "Game over, you lost!"
+      self.final_score = final_score
+      # the dimensions for the quit game button
+      self.button_w, self.button_h = manager.grid_width - 1.5, 2
+      # the coordinates of the bottom left corner for the quit game button
+      self.button_blc_x, self.button_blc_y = 5 - self.button_w / 2, 4
+
+   # A method for drawing the static parts of the menu (without the message
+   # and the score) and returning them as a picture
+   def draw(self):
+      button_blc_x, button_blc_y = self.button_blc_x, self.button_blc_y
+      # clear the background drawing canvas to background_color
+      stddraw.clear(GameOverScene.background_color)
+      # add the quit game button as a filled rectangle
+      stddraw.setPenColor(GameOverScene.button_color)
+      stddraw.filledRectangle(button_blc_x + 3, button_blc_y, self.button_w, self.button_h)
+      # add the text on the quit game button
+      stddraw.setFontFamily("Arial")
+      stddraw.setFontSize(25)
+      stddraw.setPenColor(GameOverScene.text_color)
+      text_to_display = "Exit Game"
+      stddraw.text(8, 5, text_to_display)
+      # add the back to menu game button as a filled rectangle
+      stddraw.setPenColor(GameOverScene.button_color)
+      stddraw.filledRectangle(button_blc_x + 3, button_blc_y + 3, self.button_w, self.button_h)
+      # add the text on the back to menu game button
+      stddraw.setPenColor(GameOverScene.text_color)
+      text_to_display = "Return to Main Menu"
+      stddraw.text(8, 8, text_to_display)
+      return stddraw.snapshot()
+
+   # A method for running the menu until the game is exited or the main menu
+   # is selected
+   def run(self):
+      stddraw.picture(self.manager.get_background("game over", self.draw))
+      # add the game over text
+      stddraw.setFontFamily("Arial")
+      stddraw.setPenColor(GameOverScene.text_color)
+      stddraw.setFontSize(50)
+      stddraw.text(8, 15, self.message)
+      # add the final score
+      stddraw.setFontSize(35)
+      stddraw.text(8, 13, "Score: " + str(self.final_score))
+      # a headless canvas cannot be clicked, so exit the game right away
+      if stddraw.isHeadless():
+         return None
+      button_blc_x, button_blc_y = self.button_blc_x, self.button_blc_y
+      button_w, button_h = self.button_w, self.button_h
+      while True:
+         # display the menu and wait until the mouse is left-clicked, and get the
+         # coordinates of the location at which the mouse has been left-clicked
+         mouse_x, mouse_y = wait_for_click()
+         # check if these coordinates are inside the button (Exit Game)
+         if mouse_x >= button_blc_x + 3 and mouse_x <= button_blc_x + button_w + 3:
+            if mouse_y >= button_blc_y and mouse_y <= button_blc_y + button_h:
+               return None  # end the program
+         # check if these coordinates are inside the button (Return to main menu)
+         if mouse_x >= button_blc_x + 3 and mouse_x <= button_blc_x + button_w + 3:
+            if mouse_y >= button_blc_y + 3 and mouse_y <= button_blc_y + 3 + button_h:
+               return MenuScene(self.manager)
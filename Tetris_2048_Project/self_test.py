@@ -0,0 +1,165 @@
+import os  # used for selecting the drawing backend
+import random  # used for typing random keys in the games
+import sys  # used for reading the command line arguments
+
+# the self test needs no display, the games are never drawn
+os.environ.setdefault("STDDRAW_BACKEND", "null")
+
+import numpy as np  # used for filling the game grids with random tiles
+from game_grid import GameGrid  # the class whose state is checked
+from game_session import GameSession  # the class for playing the games
+
+
+# A function for checking that the row bitmasks, the column heights, the row
+# sums, the exponent counts and the largest exponent that the given game grid
+# keeps up to date (as the tiles are locked, merged and cleared) match its
+# locked tiles, raises an AssertionError naming the first one that does not
+def check_invariants(grid):
+   tile_matrix = grid.tile_matrix
+   occupied = tile_matrix != 0
+   for row in range(grid.grid_height):
+      mask = sum(1 << col for col in np.flatnonzero(occupied[row]).tolist())
+      assert grid.row_masks[row] == mask, "row mask of row %d" % row
+      row_sum = sum(1 << e for e in tile_matrix[row].tolist() if e)
+      assert grid.row_sums[row] == row_sum, "row sum of row %d" % row
+   for col in range(grid.grid_width):
+      rows = np.flatnonzero(occupied[:, col])
+      height = int(rows[-1]) + 1 if len(rows) else 0
+      assert grid.column_heights[col] == height, "height of column %d" % col
+   counts = np.bincount(tile_matrix.ravel(), minlength=256).tolist()
+   assert grid.exponent_counts[1:] == counts[1:], "exponent counts"
+   assert grid.max_exponent == int(tile_matrix.max()), "largest exponent"
+
+# A function that checks whether the given tetromino can be moved in the given
+# direction on the given game grid cell by cell (as done before the row
+# bitmasks were kept: only the cells that the tiles on the leading edge of the
+# tetromino would move into are checked), for checking Tetromino.can_be_moved
+def can_be_moved_by_cells(tetromino, direction, grid):
+   step_x, step_y = {"left": (-1, 0), "right": (1, 0), "down": (0, -1)}[direction]
+   tile_matrix = grid.tile_matrix
+   cells = {(x, y) for x, y, _ in tetromino.get_locked_cells()}
+   for x, y in cells:
+      x, y = x + step_x, y + step_y
+      if (x, y) in cells:
+         continue
+      if x < 0 or x >= grid.grid_width or y < 0:
+         return False
+      if y < grid.grid_height and tile_matrix[y, x]:
+         return False
+   return True
+
+
+# A function for merging the tiles in the given tile exponents (a list of
+# rows from the bottom row to the top row, 0 = empty) with the rule of the
+# first version of the game, which scanned the whole grid: the passes from the
+# bottom row to the top row are repeated until no tiles are merged, and in
+# each pass the lower tile of two tiles with the same number is doubled, the
+# upper one is removed, and the tiles two and three cells above the lower tile
+# move down into the gaps (returns the points gained by merging)
+def merge_by_rule(rows):
+   grid_h, grid_w = len(rows), len(rows[0])
+   points = 0
+   merged = True
+   while merged:
+      merged = False
+      for row in range(grid_h - 1):
+         for col in range(grid_w):
+            exponent = rows[row][col]
+            if exponent == 0 or rows[row + 1][col] != exponent:
+               continue
+            rows[row][col], rows[row + 1][col] = exponent + 1, 0
+            points += 1 << (exponent + 1)
+            merged = True
+            if row + 2 < grid_h and rows[row + 2][col] and rows[row + 1][col] == 0:
+               rows[row + 1][col], rows[row + 2][col] = rows[row + 2][col], 0
+            if row + 3 < grid_h and rows[row + 3][col] and rows[row + 2][col] == 0:
+               rows[row + 2][col], rows[row + 3][col] = rows[row + 3][col], 0
+   return points
+
+# A function for removing the full rows of the given tile exponents (the rows
+# above them move down and empty rows are added at the top), returns the
+# points gained (the sum of the tile numbers in the full rows)
+def clear_by_rule(rows):
+   full_rows = [row for row in rows if all(row)]
+   points = sum(1 << exponent for row in full_rows for exponent in row)
+   rows[:] = [row for row in rows if not all(row)] + \
+      [[0] * len(rows[0]) for _ in full_rows]
+   return points
+
+# A function for checking that the tiles and the score of the given game grid
+# match the given tile exponents and score computed with the rules above
+def check_against_rule(grid, rows, score, description):
+   assert grid.tile_matrix.tolist() == rows, "tiles after " + description
+   assert grid.score == score, "score after " + description
+
+
+# A function for playing the game with the given seed on a game grid of the
+# given size with random keys, comparing the collision checks of the active
+# tetromino with the cell by cell checks before each gravity step, and
+# checking the invariants of the game grid after it and the tiles and the
+# score after each tetromino is locked against the rules above
+def check_game(seed, grid_h, grid_w, max_ticks):
+   session = GameSession(grid_h, grid_w, 5, 175, seed=seed)
+   rng = random.Random(seed)
+   game_over = False
+   while not game_over and session.tick < max_ticks:
+      key = rng.choice(GameSession.keys + (None,))
+      if key:
+         session.apply_key(key)
+      for direction in ("left", "right", "down"):
+         tetromino = session.current_tetromino
+         assert tetromino.can_be_moved(direction, session.grid) == \
+            can_be_moved_by_cells(tetromino, direction, session.grid), \
+            "collision check moving %s (seed %d, tick %d)" % (
+               direction, seed, session.tick)
+      grid, tetromino = session.grid, session.current_tetromino
+      rows, score = grid.tile_matrix.tolist(), grid.score
+      game_over = session.gravity_step()
+      check_invariants(grid)
+      # the tetromino is locked where it was when it cannot move down
+      if game_over or session.current_tetromino is not tetromino:
+         for x, y, number in tetromino.get_locked_cells():
+            if 0 <= y < grid_h:
+               rows[y][x] = number.bit_length() - 1
+         score += merge_by_rule(rows)
+         score += clear_by_rule(rows)
+         check_against_rule(grid, rows, score, "locking (seed %d, tick %d)" % (
+            seed, session.tick))
+
+# A function for checking the invariants, the tiles and the score of a game
+# grid of the given size filled with random tiles (from the given seed) in its
+# lower rows after merging and clearing them (the grids of the games rarely
+# have many tiles to be merged or many full rows)
+def check_random_grid(seed, grid_h, grid_w):
+   matrix = np.random.default_rng(seed).integers(0, 6, size=(grid_h, grid_w))
+   matrix[grid_h // 2:] = 0
+   grid = GameGrid(grid_h, grid_w, 5)
+   grid.load_tile_matrix(matrix)
+   check_invariants(grid)
+   rows = matrix.tolist()
+   grid.merge_tiles()
+   check_invariants(grid)
+   score = merge_by_rule(rows)
+   check_against_rule(grid, rows, score, "merging (seed %d)" % seed)
+   grid.clear_full_lines()
+   check_invariants(grid)
+   score += clear_by_rule(rows)
+   check_against_rule(grid, rows, score, "clearing (seed %d)" % seed)
+
+
+# The main function that plays the given number of games (from the seeds 0,
+# 1, ... on grids of a few sizes) and checks as many random grids, an
+# AssertionError names the first check that fails
+def main(games=30, max_ticks=2000):
+   sizes = ((20, 12), (8, 4), (30, 7))
+   for seed in range(games):
+      grid_h, grid_w = sizes[seed % len(sizes)]
+      check_game(seed, grid_h, grid_w, max_ticks)
+      check_random_grid(seed, grid_h, grid_w)
+   print("%d games and grids checked" % games)
+
+
+# run the self test when this module is run (the number of games can be given
+# as a command line argument)
+if __name__ == '__main__':
+   main(*(int(arg) for arg in sys.argv[1:2]))
@@ -1,184 +1,180 @@
 from tile import Tile  # used for modeling each tile on the tetrominoes
 from point import Point  # used for tile positions
-import copy as cp  # the copy module is used for copying tiles and positions
 import random  # the random module is used for generating random values
 import numpy as np  # the fundamental Python module for scientific computing
 
-# A class for modeling tetrominoes with 3 out of 7 different types as I, O and Z
+# The shapes of the 7 types of tetrominoes in their initial rotation states,
+# each shape is given as n (number of rows = number of columns in its tile
+# matrix) and the occupied cells of the tile matrix as (column_index, row_index)
+SHAPES = {
+   'I': (4, ((1, 0), (1, 1), (1, 2), (1, 3))),
+   'O': (2, ((0, 0), (1, 0), (0, 1), (1, 1))),
+   'Z': (3, ((0, 1), (1, 1), (1, 2), (2, 2))),
+   'J': (3, ((1, 0), (1, 1), (1, 2), (0, 2))),
+   'L': (3, ((1, 0), (1, 1), (1, 2), (2, 2))),
+   'S': (3, ((1, 0), (2, 0), (0, 1), (1, 1))),
+   'T': (3, ((0, 1), (1, 1), (2, 1), (1, 2))),
+}
+
+# A class for modeling a rotation state of a tetromino (built once for each
+# rotation of each shape, so rotating a tetromino only changes an index)
+class RotationState:
+   # A constructor that creates a rotation state from the occupied cells of an
+   # n x n tile matrix given as (column_index, row_index) pairs
+   def __init__(self, n, cells):
+      self.n = n
+      # the (column_index, row_index) of each tile in the tile matrix
+      self.cells = tuple(cells)
+      # the (dx, dy) position of each tile relative to the bottom left cell
+      self.offsets = tuple((col, (n - 1) - row) for col, row in cells)
+      # the bounding box of the occupied cells in the tile matrix
+      self.min_col = min(col for col, row in cells)
+      self.max_col = max(col for col, row in cells)
+      self.min_row = min(row for col, row in cells)
+      self.max_row = max(row for col, row in cells)
+      # the (dx, dy) offsets of the tiles on the leading edge for each moving
+      # direction (the leftmost/rightmost tile of each row and the bottommost
+      # tile of each column), only these tiles can be blocked by the grid
+      leftmost, rightmost, bottommost = {}, {}, {}
+      for dx, dy in self.offsets:
+         leftmost[dy] = min(dx, leftmost.get(dy, dx))
+         rightmost[dy] = max(dx, rightmost.get(dy, dx))
+         bottommost[dx] = min(dy, bottommost.get(dx, dy))
+      self.edges = {
+         "left": tuple((dx, dy) for dy, dx in leftmost.items()),
+         "right": tuple((dx, dy) for dy, dx in rightmost.items()),
+         "down": tuple(bottommost.items()),
+      }
+      # the bounds of the offsets of the tiles
+      self.min_dx, self.max_dx = self.min_col, self.max_col
+      self.min_dy, self.max_dy = (n - 1) - self.max_row, (n - 1) - self.min_row
+      # the tiles as (dy, mask) pairs of row bitmasks where bit k of mask is
+      # set for the tile at (min_dx + k, dy), for all the tiles and for the
+      # tiles on the leading edge of each moving direction
+      self.row_masks = self.to_row_masks(self.offsets)
+      self.edge_row_masks = {direction: self.to_row_masks(edge)
+                             for direction, edge in self.edges.items()}
+
+   # A method that groups the given (dx, dy) offsets into row bitmasks
+   def to_row_masks(self, offsets):
+      masks = {}
+      for dx, dy in offsets:
+         masks[dy] = masks.get(dy, 0) | (1 << (dx - self.min_dx))
+      return tuple(sorted(masks.items()))
+
+   # A method that returns the rotation state after rotating this one
+   # clockwise by 90 degrees
+   def rotated_clockwise(self):
+      # the cell at (row, col) moves to (col, n - 1 - row)
+      return RotationState(self.n, [(self.n - 1 - row, col) for col, row in self.cells])
+
+# A function that builds the 4 rotation states of each shape in SHAPES
+def build_rotation_states():
+   rotation_states = {}
+   for shape, (n, cells) in SHAPES.items():
+      states = [RotationState(n, cells)]
+      for _ in range(3):
+         states.append(states[-1].rotated_clockwise())
+      rotation_states[shape] = tuple(states)
+   return rotation_states
+
+# the 4 rotation states of each shape, built once at import
+ROTATION_STATES = build_rotation_states()
+
+# A class for modeling tetrominoes with 7 different types as I, O, Z, J, L, S
+# and T
 class Tetromino:
    # the dimensions of the game grid (defined as class variables)
    grid_height, grid_width = None, None
 
-   # A constructor for creating a tetromino with a given shape (type)
-   def __init__(self, shape):
+   # A constructor for creating a tetromino with a given shape (type), its
+   # random values are generated by using the given random number generator (a
+   # random.Random object, the random module is used when it is not given)
+   def __init__(self, shape, rng=None):
+      if rng is None:
+         rng = random
       self.type = shape  # set the type of this tetromino
-      # determine the occupied (non-empty) cells in the tile matrix based on
-      # we give the shape of this tetromino using occupied_cells list it is 2d list 
-      # and it keeps the column and row indexes of tiles
-      occupied_cells = []
-      if self.type == 'I':
-         n = 4  # n = number of rows = number of columns in the tile matrix
-         # because of that we have  4*4 =16 cells matrix 
-         # and here we fill the tiles according to shape of the tetromino I in its initial rotation state
-         occupied_cells.append((1, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((1, 3))
-      elif self.type == 'O':
-         n = 2  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino O in its initial rotation state
-         # because of that we have  2*2 =4 cells matrix 
-         # and here we fill the tiles according to shape of the tetromino O in its initial rotation state
-         occupied_cells.append((0, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-      elif self.type == 'Z':
-         n = 3  # n = number of rows = number of columns in the tile matrix
-         # shape of the tetromino Z in its initial rotation state
-         # because of that we have  3*3 =9 cells matrix 
-         # and here we fill the tiles according to shape of the tetromino Z in its initial rotation state
-         occupied_cells.append((0, 1))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((2, 2))
-      elif self.type == 'J':
-         n = 3
-         # and here we fill the tiles according to shape of the tetromino J in its initial rotation state
-         # J tetromino shape
-         occupied_cells.append((1, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((0, 2))
-      elif self.type == 'L':
-         n = 3
-         # and here we fill the tiles according to shape of the tetromino L in its initial rotation state
-         # L tetromino shape
-         occupied_cells.append((1, 0))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((1, 2))
-         occupied_cells.append((2, 2))
-      elif self.type == 'S':
-         n = 3
-         # and here we fill the tiles according to shape of the tetromino S in its initial rotation state
-         # S tetromino shape
-         occupied_cells.append((1, 0))  # (column_index, row_index)
-         occupied_cells.append((2, 0))
-         occupied_cells.append((0, 1))
-         occupied_cells.append((1, 1))
-      elif self.type == 'T':
-         n = 3
-         # and here we fill the tiles according to shape of the tetromino T in its initial rotation state
-         # T tetromino shape
-         occupied_cells.append((0, 1))  # (column_index, row_index)
-         occupied_cells.append((1, 1))
-         occupied_cells.append((2, 1))
-         occupied_cells.append((1, 2))   
-      # REST OF THIS SAME WITH THE BASE CODE THAT WE GET
-      # create a matrix of numbered tiles based on the shape of this tetromino
-      self.tile_matrix = np.full((n, n), None)
-      # create the four tiles (minos) of this tetromino and place these tiles
-      # into the tile matrix
-      for i in range(len(occupied_cells)):
-         col_index, row_index = occupied_cells[i][0], occupied_cells[i][1]
-         # create a tile for each occupied cell of this tetromino
-         self.tile_matrix[row_index][col_index] = Tile()
+      # the precomputed rotation states of this shape and the current one
+      self.states = ROTATION_STATES[shape]
+      self.rotation = 0
+      n = self.states[0].n  # n = number of rows = number of columns
+      # create the four tiles (minos) of this tetromino, the tile at index i
+      # occupies the cell at index i of the cells of the rotation state
+      self.tiles = [Tile(rng) for _ in self.states[0].cells]
       # initialize the position of this tetromino (as the bottom left cell in
       # the tile matrix) with a random horizontal position above the game grid
       self.bottom_left_cell = Point()
       self.bottom_left_cell.y = Tetromino.grid_height - 1
-      self.bottom_left_cell.x = random.randint(0, Tetromino.grid_width - n)
+      self.bottom_left_cell.x = rng.randint(0, Tetromino.grid_width - n)
+
+   # A method that returns the tiles of this tetromino with the (column_index,
+   # row_index) of their cells in the tile matrix of the current rotation state
+   def get_tiles(self):
+      return zip(self.states[self.rotation].cells, self.tiles)
 
-      # A method for rotating this tetromino clockwise by 90 degrees
-      # It takes game grid as parameter 
+   # A method for rotating this tetromino clockwise by 90 degrees
+   # It takes game grid as parameter
    def rotate_clockwise(self, game_grid):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      # create a copy of the current tile matrix and fill as empty cells
-      new_tile_matrix = np.full((n, n), None)
-      # rotate the tile matrix by 90 degrees clockwise thanks to these for loops
-      for row in range(n):
-         for col in range(n):
-            new_tile_matrix[col][n - 1 - row] = self.tile_matrix[row][col]
-            # here we rotate each cells by 90 degrees clockwise
+      # the next rotation state is precomputed, rotating only changes an index
+      rotation = (self.rotation + 1) % len(self.states)
       # check if the rotated tetromino can fit in the game grid
-      if self.can_fit(new_tile_matrix, game_grid): # If the created tile matrix can fit into the game grid, we update the tile matrix
-         self.tile_matrix = new_tile_matrix  # update the tile matrix
-      return self.can_fit(new_tile_matrix, game_grid)  # return whether the rotation was successful
-
-   # A method for checking if a given tile matrix can fit in the game grid
-   def can_fit(self, tile_matrix, game_grid): # It takes game grid as parameter 
-      n = len(tile_matrix)  # n = number of rows = number of columns
-      for row in range(n):
-         for col in range(n):
-            # check if any cell of the rotated tile matrix overlaps with an
-            # occupied cell in the game grid thanks to these for loops
-            if tile_matrix[row][col] is not None: # if tile is not empty we do the operations
-               position = self.get_cell_position(row, col) # we get position of tile
-               if position.y < 0 or position.y >= Tetromino.grid_height or position.x < 0 or position.x >= Tetromino.grid_width:
-                  return False  # the rotated tetromino is out of bounds we return false
-               if game_grid.is_occupied(position.y, position.x):
-                  return False  # the rotated tetromino overlaps with an occupied cell we return false
-      return True  # the rotated tetromino fits in the game grid we return true
-     
-      
-   # A method that computes and returns the position of the cell in the tile
-   # matrix specified by the given row and column indexes
-   def get_cell_position(self, row, col):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      position = Point()
-      # horizontal position of the cell
-      position.x = self.bottom_left_cell.x + col
-      # vertical position of the cell
-      position.y = self.bottom_left_cell.y + (n - 1) - row
-      return position
+      if not self.can_fit(rotation, game_grid):
+         return False  # the rotation was not successful
+      self.rotation = rotation  # update the rotation state
+      return True  # the rotation was successful
+
+   # A method for checking if this tetromino in a given rotation state can fit
+   # in the game grid
+   def can_fit(self, rotation, game_grid): # It takes game grid as parameter
+      state = self.states[rotation]
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      if y + state.min_dy < 0 or y + state.max_dy >= Tetromino.grid_height:
+         return False  # the rotated tetromino is out of bounds we return false
+      if x + state.min_dx < 0 or x + state.max_dx >= Tetromino.grid_width:
+         return False  # the rotated tetromino is out of bounds we return false
+      # the rotated tetromino fits in the game grid if it does not overlap with
+      # an occupied cell (checked row by row with bitmasks)
+      return not game_grid.overlaps(x + state.min_dx, y, state.row_masks)
 
    # A method to return a copy of the tile matrix without any empty row/column,
    # and the position of the bottom left cell when return_position is set
    def get_min_bounded_tile_matrix(self, return_position=False):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      # determine rows and columns to copy (omit empty rows and columns)
-      min_row, max_row, min_col, max_col = n - 1, 0, n - 1, 0
-      for row in range(n):
-         for col in range(n):
-            if self.tile_matrix[row][col] is not None:
-               if row < min_row:
-                  min_row = row
-               if row > max_row:
-                  max_row = row
-               if col < min_col:
-                  min_col = col
-               if col > max_col:
-                  max_col = col
-      # copy the tiles from the tile matrix of this tetromino
+      state = self.states[self.rotation]
+      n = state.n  # n = number of rows = number of columns
+      # the rows and columns to copy (omitting empty rows and columns) are
+      # precomputed for the rotation state
+      min_row, max_row, min_col, max_col = state.min_row, state.max_row, state.min_col, state.max_col
+      # copy the tiles from the tile matrix of this tetromino (the tiles are
+      # not copied, the matrix refers to the tiles of this tetromino)
       copy = np.full((max_row - min_row + 1, max_col - min_col + 1), None)
-      for row in range(min_row, max_row + 1):
-         for col in range(min_col, max_col + 1):
-            if self.tile_matrix[row][col] is not None:
-               row_ind = row - min_row
-               col_ind = col - min_col
-               copy[row_ind][col_ind] = cp.deepcopy(self.tile_matrix[row][col])
+      for (col, row), tile in zip(state.cells, self.tiles):
+         copy[row - min_row][col - min_col] = tile
       # return just the matrix copy when return_position is not set (as True)
       # the argument return_position defaults to False when a value is not given
       if not return_position:
          return copy
       # otherwise return the position of the bottom left cell in copy as well
       else:
-         blc_position = cp.copy(self.bottom_left_cell)
-         blc_position.translate(min_col, (n - 1) - max_row)
+         blc_position = Point(self.bottom_left_cell.x + min_col,
+                              self.bottom_left_cell.y + (n - 1) - max_row)
          return copy, blc_position
 
-   # A method for drawing the tetromino on the game grid
-   def draw(self):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      for row in range(n):
-         for col in range(n):
-            # draw each occupied cell as a tile on the game grid
-            if self.tile_matrix[row][col] is not None:
-               # get the position of the tile
-               position = self.get_cell_position(row, col)
-               # draw only the tiles that are inside the game grid
-               if position.y < Tetromino.grid_height:
-                  self.tile_matrix[row][col].draw(position)
+   # A method that returns the (column, row, number) values of all the tiles
+   # of this tetromino for locking them on the game grid
+   def get_locked_cells(self):
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      return [(x + dx, y + dy, tile.number)
+              for (dx, dy), tile in zip(self.states[self.rotation].offsets, self.tiles)]
+
+   # A method that returns the numbers of the tiles of this tetromino that are
+   # inside the game grid, keyed by the (column, row) positions of the tiles
+   def get_cells(self):
+      cells = {}
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      for (dx, dy), tile in zip(self.states[self.rotation].offsets, self.tiles):
+         if y + dy < Tetromino.grid_height:
+            cells[(x + dx, y + dy)] = tile.number
+      return cells
 
    # A method for moving this tetromino in a given direction by 1 on the grid
    def move(self, direction, game_grid, hard_drop=False):
@@ -192,60 +188,62 @@ class Tetromino:
       elif direction == "right":
          self.bottom_left_cell.x += 1
       elif direction == "down" and not hard_drop:
-         self.bottom_left_cell.y -= 1   
-      elif direction == "h" and hard_drop: # here we implement the hard drop 
-         while self.can_be_moved("down", game_grid): # when user pressed h we drop hardly the tetramino until it doesnt move
-            self.bottom_left_cell.y -= 1
+         self.bottom_left_cell.y -= 1
+      elif direction == "h" and hard_drop: # here we implement the hard drop
+         # when user pressed h we drop hardly the tetramino until it doesnt move
+         # (the drop distance is computed at once from the column heights)
+         self.bottom_left_cell.y -= self.get_drop_distance(game_grid)
       return True  # a successful move in the given direction
 
+   # A method that returns the number of rows this tetromino can move down
+   # from its current position before landing
+   def get_drop_distance(self, game_grid):
+      state = self.states[self.rotation]
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      # if the tetromino is above the highest tile of each of its columns, it
+      # lands on the highest of them (a min over its bottom profile)
+      bottom_profile = state.edges["down"]
+      if game_grid.is_above_columns(x, y, bottom_profile):
+         return y - game_grid.get_landing_y(x, bottom_profile)
+      # otherwise (below an overhang) it is moved down row by row
+      distance = 0
+      edge_row_masks = state.edge_row_masks["down"]
+      while y - distance - 1 + state.min_dy >= 0 and \
+            not game_grid.overlaps(x + state.min_dx, y - distance - 1, edge_row_masks):
+         distance += 1
+      return distance
+
+   # A method that returns the y of the bottom left cell of this tetromino
+   # after it is dropped from above the game grid in a given rotation state
+   # with its bottom left cell at a given column x (e.g., for searching the
+   # placements of this tetromino)
+   def get_landing_y(self, game_grid, rotation=None, x=None):
+      if rotation is None:
+         rotation = self.rotation
+      if x is None:
+         x = self.bottom_left_cell.x
+      return game_grid.get_landing_y(x, self.states[rotation].edges["down"])
+
    # A method for checking if this tetromino can be moved in a given direction
    def can_be_moved(self, direction, game_grid):
-      n = len(self.tile_matrix)  # n = number of rows = number of columns
-      # check for moving left or right
-      if direction == "left" or direction == "right":
-         for row_index in range(n):
-            for col_index in range(n):
-               # direction = left --> check the leftmost tile of each row
-               row, col = row_index, col_index
-               if direction == "left" and self.tile_matrix[row][col] is not None:
-                  # the position of the leftmost tile of the current row
-                  leftmost = self.get_cell_position(row, col)
-                  # if any leftmost tile is at x = 0
-                  if leftmost.x == 0:
-                     return False  # this tetromino cannot be moved left
-                  # if the grid cell on the left of a leftmost tile is occupied
-                  if game_grid.is_occupied(leftmost.y, leftmost.x - 1):
-                     return False  # this tetromino cannot be moved left
-                  # as the leftmost tile of the current row is checked
-                  break  # end the inner for loop
-               # direction = right --> check the rightmost tile of each row
-               row, col = row_index, n - 1 - col_index
-               if direction == "right" and self.tile_matrix[row][col] is not None:
-                  # the position of the rightmost tile of the current row
-                  rightmost = self.get_cell_position(row, col)
-                  # if any rightmost tile is at x = grid_width - 1
-                  if rightmost.x == Tetromino.grid_width - 1:
-                     return False  # this tetromino cannot be moved right
-                  # if the grid cell on the right of a rightmost tile is occupied
-                  if game_grid.is_occupied(rightmost.y, rightmost.x + 1):
-                     return False  # this tetromino cannot be moved right
-                  # as the rightmost tile of the current row is checked
-                  break  # end the inner for loop
-      # direction = down --> check the bottommost tile of each column
+      # the change in the position for the given direction
+      if direction == "left":
+         step_x, step_y = -1, 0
+      elif direction == "right":
+         step_x, step_y = 1, 0
+      # direction = down (a hard drop is checked as moving down step by step)
       else:
-         for col in range(n):
-            for row in range(n - 1, -1, -1):
-               # if the current cell of the tetromino is occupied by a tile
-               if self.tile_matrix[row][col] is not None:
-                  # the position of the bottommost tile of the current col
-                  bottommost = self.get_cell_position(row, col)
-                  # if any bottommost tile is at y = 0
-                  if bottommost.y == 0:
-                     return False  # this tetromino cannot be moved down
-                  # if the grid cell below any bottommost tile is occupied
-                  if game_grid.is_occupied(bottommost.y - 1, bottommost.x):
-                     return False  # this tetromino cannot be moved down
-                  # as the bottommost tile of the current row is checked
-                  break  # end the inner for loop
-      # if this method does not end by returning False before this line
-      return True  # this tetromino can be moved in the given direction
+         step_x, step_y = 0, -1
+      state = self.states[self.rotation]
+      x, y = self.bottom_left_cell.x + step_x, self.bottom_left_cell.y + step_y
+      # if any tile would leave the game grid from its sides or bottom
+      if x + state.min_dx < 0 or x + state.max_dx >= Tetromino.grid_width or y + state.min_dy < 0:
+         return False  # this tetromino cannot be moved in this direction
+      # a tetromino that would stay above the highest tile of each of its
+      # columns can be moved down (checked with the column heights)
+      if step_y and game_grid.is_above_columns(x, y, state.edges["down"]):
+         return True
+      # check the cells that the tiles on the leading edge of the tetromino
+      # would move into (the other tiles move into cells of this tetromino)
+      edge_row_masks = state.edge_row_masks["down" if step_y else direction]
+      return not game_grid.overlaps(x + state.min_dx, y, edge_row_masks)
@@ -1,6 +1,6 @@
 import random
 import lib.stddraw as stddraw  # used for drawing the tiles to display them
-from lib.color import Color  # used for coloring the tiles
+from lib.color import getColor  # used for coloring the tiles (shared colors)
 
 # A class for modeling numbered tiles as in 2048
 class Tile:
@@ -12,49 +12,95 @@ class Tile:
    font_family, font_size = "Arial", 14
    # dictionary to correlate the tile numbers to the tile colors
    color_key = {
-         2: Color(238, 228, 218),   # Skin color
-         4: Color(236, 224, 199),   # Shade of red
-         8: Color(243, 177, 120),   # Shade of red
-         16: Color(244, 150, 100),  # Shade of red
-         32: Color(249, 123, 98),    # Shade of red
-         64: Color(237, 97, 86),
-         128: Color(250, 69, 56),
-         256: Color(255, 60, 48),
-         512: Color(255, 90, 11),
-         1024: Color(233, 103, 189),
-         2048: Color(233, 149, 112),    # Shade of red
-         4096: Color(0, 0, 0)       # Black
+         2: getColor(238, 228, 218),   # Skin color
+         4: getColor(236, 224, 199),   # Shade of red
+         8: getColor(243, 177, 120),   # Shade of red
+         16: getColor(244, 150, 100),  # Shade of red
+         32: getColor(249, 123, 98),    # Shade of red
+         64: getColor(237, 97, 86),
+         128: getColor(250, 69, 56),
+         256: getColor(255, 60, 48),
+         512: getColor(255, 90, 11),
+         1024: getColor(233, 103, 189),
+         2048: getColor(233, 149, 112),    # Shade of red
+         4096: getColor(0, 0, 0)       # Black
       }
-   # A constructor that creates a tile with 2 as the number on it
-   def __init__(self):
+   # the background color used for the numbers missing in color_key
+   default_color = getColor(238, 228, 218)
+   # the colors used for the numbers and the boxes (boundaries) of all tiles
+   foreground_color = getColor(159, 149, 138)
+   box_color = getColor(143, 134, 125)
+   # the cache (atlas) of the pictures of the tiles, keyed by the tile number
+   # and the size of the tile in pixels
+   sprites = {}
+   # a tile stores only its number and its background color (a reference to
+   # a shared color in color_key) without a per-object dictionary
+   __slots__ = ("number", "background_color")
+
+   # A constructor that creates a tile with 2 or 4 as the number on it, chosen
+   # by using the given random number generator (a random.Random object, the
+   # random module is used when it is not given)
+   def __init__(self, rng=None):
+      if rng is None:
+         rng = random
       # set the number on this tile
-      self.number = random.choice([2, 4]) #choose randomly between 2 and 4
+      self.number = rng.choice([2, 4]) #choose randomly between 2 and 4
       # set the colors of this tile
-      self.change_color()  
-      self.foreground_color = Color(159,149,138)  # foreground (number) color
-      self.box_color = Color(143,134,125)  # box (boundary) color
-      
+      self.change_color()
+
    def change_color(self):
-      # checks if the number attribute is in the dictionary
-      if self.number in self.color_key:
-         # updates to the corresponding color
-         self.background_color = self.color_key[self.number]
-      else:
-         #keeps the color at default
-         self.background_color = Color(238,228,218)
+      # updates to the color corresponding to the number attribute
+      self.background_color = Tile.get_background_color(self.number)
+
+   # A method that returns the background color of the tiles with a given number
+   @staticmethod
+   def get_background_color(number):
+      # checks if the number is in the dictionary, else keeps the default color
+      return Tile.color_key.get(number, Tile.default_color)
 
    # A method for drawing this tile at a given position with a given length
    def draw(self, position, length=1):  # length defaults to 1
+      Tile.draw_number(self.number, position, length)
+
+   # A method for drawing a tile with a given number at a given position
+   # (the game grid keeps only the exponents of the locked tile numbers, so the
+   # colors and the labels of its cells are computed here while drawing)
+   @staticmethod
+   def draw_number(number, position, length=1):  # length defaults to 1
+      # draw the cached picture of the tile with a single blit
+      stddraw.picture(Tile.get_sprite(number, length), position.x, position.y)
+
+   # A method that returns the picture of a tile with a given number and
+   # length, rendering it only the first time it is needed
+   @staticmethod
+   def get_sprite(number, length=1):  # length defaults to 1
+      key = (number, stddraw.scaledSize(length, length))
+      if key not in Tile.sprites:
+         Tile.sprites[key] = stddraw.renderPicture(
+            length, length, lambda: Tile.render(number, length))
+      return Tile.sprites[key]
+
+   # A method for building the pictures of all the numbers in color_key up
+   # front (called after the scale of the drawing canvas is set)
+   @staticmethod
+   def build_atlas(length=1):  # length defaults to 1
+      for number in Tile.color_key:
+         Tile.get_sprite(number, length)
+
+   # A method for drawing a tile with a given number and length centered at
+   # the origin (used for rendering the pictures of the tiles)
+   @staticmethod
+   def render(number, length):
       # draw the tile as a filled square
-      stddraw.setPenColor(self.background_color)
-      stddraw.filledSquare(position.x, position.y, length / 2)
+      stddraw.setPenColor(Tile.get_background_color(number))
+      stddraw.filledSquare(0, 0, length / 2)
       # draw the bounding box around the tile as a square
-      stddraw.setPenColor(self.box_color)
+      stddraw.setPenColor(Tile.box_color)
       stddraw.setPenRadius(Tile.boundary_thickness)
-      stddraw.square(position.x, position.y, length / 2)
+      stddraw.square(0, 0, length / 2)
       stddraw.setPenRadius()  # reset the pen radius to its default value
       # draw the number on the tile
-      stddraw.setPenColor(self.foreground_color)
+      stddraw.setPenColor(Tile.foreground_color)
       stddraw.setFontFamily(Tile.font_family)
       stddraw.setFontSize(Tile.font_size)
-      stddraw.text(position.x, position.y, str(self.number))
+      stddraw.text(0, 0, str(number))